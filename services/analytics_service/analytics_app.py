@@ -1,12 +1,43 @@
+import asyncio
+import json
+import logging
+import math
+import os
+import sys
 import uuid
-from typing import List, Dict, Any
-from fastapi import FastAPI, Depends
+from array import array
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from itertools import compress
+from urllib.parse import quote
+from typing import List, Dict, Any, Iterable, Optional, Literal
+from fastapi import FastAPI, Depends, HTTPException, Query as QueryParam, Response
 from pydantic import BaseModel, Field
-from sqlalchemy import create_engine, Column, String, JSON, func, DateTime
+from sqlalchemy import insert, Column, String, JSON, func, DateTime, Integer, Float, Index, cast, literal_column, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.schema import CreateIndex
 from sqlalchemy.dialects.postgresql import UUID as PG_UUID
 from sqlalchemy.orm import sessionmaker, Session, declarative_base
 from fastapi.middleware.cors import CORSMiddleware
 
+# Shared SQLite engine setup lives in services/common
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from sqlite_db import create_sqlite_engine, create_read_engine  # noqa: E402
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    import pyarrow.fs as pafs
+except ImportError:  # the columnar archive is optional; without it every event stays in SQLite
+    pa = None
+
+try:
+    import numpy as np
+except ImportError:  # item analysis is optional
+    np = None
+
 # --- 1. FastAPI Application & Middleware ---
 app = FastAPI(
     title="Lightweight Analytics Service",
@@ -26,9 +57,11 @@ app.add_middleware(
 )
 
 # --- 2. Database Setup ---
-DATABASE_URL = "sqlite:///./analytics.db"
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+DATABASE_URL = os.getenv("ANALYTICS_DATABASE_URL", "sqlite:///./analytics.db")
+engine = create_sqlite_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Query endpoints; rebound to a read-only connection pool once the schema exists
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
 
@@ -41,9 +74,66 @@ class Event(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
 
+def payload_field(name: str, type_=String):
+    """
+    json_extract(payload, '$.<name>') as a SQL expression. The path is rendered as a
+    literal (not a bound parameter) so queries match the expression indexes below.
+    """
+    return func.json_extract(Event.payload, literal_column(f"'$.{name}'"), type_=type_)
+
+
+# JSON-extracted payload columns used for server-side filtering and aggregation
+EVENT_QUIZ_ID = payload_field("quizId")
+EVENT_USER_ID = payload_field("userId")
+EVENT_METRICS = {"score": payload_field("score", Float), "correct": payload_field("correct", Float)}
+
+Index("ix_events_type_created_at", Event.event_type, Event.created_at)
+Index("ix_events_quiz_created_at", EVENT_QUIZ_ID, Event.created_at)
+Index("ix_events_user_created_at", EVENT_USER_ID, Event.created_at)
+
+
+class ArchivedEventId(Base):
+    """
+    Ids of events compacted out of the events table, so a redelivered event whose
+    original was already archived is still recognized as a duplicate.
+    """
+    __tablename__ = "archived_event_ids"
+    id = Column(PG_UUID(as_uuid=True), primary_key=True)
+
+
+class DeadLetterEvent(Base):
+    """Buffered events that could not be written even on their own; kept for inspection."""
+    __tablename__ = "dead_letter_events"
+    id = Column(PG_UUID(as_uuid=True), primary_key=True)
+    event_type = Column(String)
+    payload = Column(JSON)
+    error = Column(String)
+    failed_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class UserQuizStats(Base):
+    """
+    Materialized per-user/per-quiz aggregate of 'quiz_completed' events.
+    Kept up to date by record_event so profile stats never scan the events table.
+    """
+    __tablename__ = "user_quiz_stats"
+    user_id = Column(String, primary_key=True)
+    quiz_id = Column(String, primary_key=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    total_score = Column(Float, nullable=False, default=0.0)
+    best_score = Column(Float, nullable=False, default=0.0)
+    last_score = Column(Float, nullable=False, default=0.0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
 class EventSchema(BaseModel):
     event_type: str = Field(..., description="e.g., 'quiz_completed'")
     payload: Dict[str, Any]
+    id: Optional[uuid.UUID] = Field(None, description="Optional idempotency key; re-sending a known id is a no-op.")
+
+
+class EventBatchSchema(BaseModel):
+    events: List[EventSchema]
 
 
 class EventResponseSchema(EventSchema):
@@ -54,10 +144,1019 @@ class EventResponseSchema(EventSchema):
         from_attributes = True
 
 
-# --- 4. Database Session & Startup ---
+class QuizStatsSchema(BaseModel):
+    quiz_id: str
+    attempts: int
+    average_score: float
+    best_score: float
+    last_score: float
+
+
+class UserStatsSchema(BaseModel):
+    user_id: str
+    quizzes_taken: int
+    average_score: float
+    best_score: float
+    quizzes: List[QuizStatsSchema] = []
+
+
+class HistogramBinSchema(BaseModel):
+    lower: float
+    upper: float
+    count: int
+
+
+class EventBucketSchema(BaseModel):
+    bucket_start: datetime
+    count: int
+    measured: int  # events in the bucket that carry the aggregated field
+    average: Optional[float] = None
+    minimum: Optional[float] = None
+    maximum: Optional[float] = None
+    percentiles: Dict[str, float] = {}
+    histogram: List[HistogramBinSchema] = []
+
+
+class EventAggregateSchema(BaseModel):
+    field: str
+    bucket_seconds: int
+    buckets: List[EventBucketSchema]
+
+
+class ItemOptionSchema(BaseModel):
+    option: str
+    count: int
+    rate: float
+    upper_rate: float  # share of the top-scoring group that picked this option
+    lower_rate: float  # share of the bottom-scoring group that picked this option
+    is_key: bool
+
+
+class ItemStatsSchema(BaseModel):
+    question_id: str
+    answered: int
+    unanswered_rate: float
+    graded: int  # submissions that carry per-question results
+    difficulty: Optional[float] = None  # proportion correct (p-value)
+    discrimination: Optional[float] = None  # upper-lower 27% index
+    point_biserial: Optional[float] = None
+    options: List[ItemOptionSchema] = []
+
+
+class ScoreDistributionSchema(BaseModel):
+    mean: Optional[float] = None
+    std: Optional[float] = None
+    percentiles: Dict[str, float] = {}
+    histogram: List[HistogramBinSchema] = []
+
+
+class ItemAnalysisSchema(BaseModel):
+    quiz_id: str
+    submissions: int
+    skipped_submissions: int = Field(0, description="Malformed submissions left out of the analysis")
+    scores: ScoreDistributionSchema
+    items: List[ItemStatsSchema]
+
+
+# --- 4. Aggregate Helpers ---
+QUIZ_COMPLETED = "quiz_completed"
+
+
+def quiz_score(payload: Dict[str, Any]) -> Optional[float]:
+    """A payload's score as a finite float (a missing score counts as 0), or None if it isn't a number."""
+    score = payload.get("score")
+    if score is None:
+        return 0.0
+    if isinstance(score, bool):
+        return None
+    try:
+        score = float(score)
+    except (TypeError, ValueError):
+        return None
+    return score if math.isfinite(score) else None
+
+
+def invalid_event_reason(event_type: str, payload: Dict[str, Any]) -> Optional[str]:
+    """Why an incoming event can't be recorded, or None if it can."""
+    if event_type == QUIZ_COMPLETED and quiz_score(payload) is None:
+        return "quiz_completed score must be a number"
+    return None
+
+
+def apply_quiz_completed(db: Session, payloads: Iterable[Dict[str, Any]]):
+    """
+    Fold 'quiz_completed' payloads into user_quiz_stats.
+    Payloads are pre-aggregated per (user, quiz) so a batch costs one atomic upsert
+    per pair, and concurrent requests never lose an attempt.
+    Payloads without a user, a quiz or a numeric score are skipped.
+    Does not commit; the caller owns the transaction.
+    """
+    totals: Dict[tuple, Dict[str, float]] = {}
+    for payload in payloads:
+        if not isinstance(payload, dict):
+            continue
+        user_id = payload.get("userId")
+        quiz_id = payload.get("quizId")
+        score = quiz_score(payload)
+        if user_id is None or quiz_id is None or score is None:
+            continue
+        entry = totals.get((str(user_id), str(quiz_id)))
+        if entry is None:
+            totals[(str(user_id), str(quiz_id))] = {"attempts": 1, "total": score, "best": score, "last": score}
+        else:
+            entry["attempts"] += 1
+            entry["total"] += score
+            entry["best"] = max(entry["best"], score)
+            entry["last"] = score
+
+    for (user_id, quiz_id), entry in totals.items():
+        stmt = sqlite_insert(UserQuizStats).values(
+            user_id=user_id,
+            quiz_id=quiz_id,
+            attempts=entry["attempts"],
+            total_score=entry["total"],
+            best_score=entry["best"],
+            last_score=entry["last"],
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[UserQuizStats.user_id, UserQuizStats.quiz_id],
+            set_={
+                "attempts": UserQuizStats.attempts + entry["attempts"],
+                "total_score": UserQuizStats.total_score + entry["total"],
+                "best_score": func.max(UserQuizStats.best_score, entry["best"]),
+                "last_score": entry["last"],
+                "updated_at": func.now(),
+            },
+        )
+        db.execute(stmt)
+
+
+def rebuild_user_stats(db: Session):
+    """One-off backfill of user_quiz_stats from events recorded before the table existed."""
+    payloads = db.query(Event.payload).filter(Event.event_type == QUIZ_COMPLETED).yield_per(1000)
+    apply_quiz_completed(db, (payload or {} for (payload,) in payloads))
+    db.commit()
+
+
+def to_utc_naive(value: Optional[datetime]) -> Optional[datetime]:
+    """created_at is stored as naive UTC (SQLite CURRENT_TIMESTAMP)."""
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def filter_events(query, event_type: Optional[str] = None, quiz_id: Optional[str] = None,
+                  user_id: Optional[str] = None, since: Optional[datetime] = None,
+                  until: Optional[datetime] = None):
+    """Apply the common event filters; each one is served by an index on events."""
+    if event_type is not None:
+        query = query.filter(Event.event_type == event_type)
+    if quiz_id is not None:
+        query = query.filter(EVENT_QUIZ_ID == quiz_id)
+    if user_id is not None:
+        query = query.filter(EVENT_USER_ID == user_id)
+    if since is not None:
+        query = query.filter(Event.created_at >= to_utc_naive(since))
+    if until is not None:
+        query = query.filter(Event.created_at < to_utc_naive(until))
+    return query
+
+
+def event_bucket(bucket_seconds: int):
+    """Start of the created_at bucket in epoch seconds, as a SQL expression."""
+    return (cast(func.strftime("%s", Event.created_at), Integer) // bucket_seconds * bucket_seconds).label("bucket")
+
+
+def new_bucket(start: int, count: int, measured: int, total: Optional[float],
+               minimum: Optional[float], maximum: Optional[float]) -> Dict[str, Any]:
+    return {
+        "bucket_start": datetime.fromtimestamp(start, timezone.utc),
+        "count": count,
+        "measured": measured,
+        "average": total / measured if measured else None,
+        "minimum": minimum,
+        "maximum": maximum,
+        "percentiles": {},
+        "histogram": [],
+    }
+
+
+def summarize_hot_events(db: Session, field: str, bucket_seconds: int, bin_width: float,
+                         **filters) -> tuple:
+    """
+    Partial aggregates of the hot rows, computed by SQLite:
+      summary   {bucket: [count, measured, sum, min, max]}
+      histogram {(bucket, bin): count}
+    They merge with the same partials of other sources by adding counts and sums.
+    """
+    value = EVENT_METRICS[field]
+    bucket = event_bucket(bucket_seconds)
+    summary = filter_events(
+        db.query(bucket, func.count(), func.count(value), func.sum(value), func.min(value), func.max(value)),
+        **filters,
+    ).group_by(bucket)
+    bin_index = func.floor(value / bin_width).label("bin")
+    histogram = filter_events(db.query(bucket, bin_index, func.count()), **filters) \
+        .filter(value.isnot(None)).group_by(bucket, bin_index)
+    return (
+        {start: list(row) for start, *row in summary},
+        {(start, float(index)): count for start, index, count in histogram},
+    )
+
+
+def hot_percentiles(db: Session, field: str, bucket_seconds: int, percentiles: List[float],
+                    **filters) -> Dict[int, Dict[str, float]]:
+    """
+    Nearest-rank percentiles of the hot rows per bucket: measured values are ranked
+    inside each bucket and the p-th percentile is the smallest value whose rank
+    reaches p% of the bucket. Only one row per bucket comes back.
+    """
+    value = EVENT_METRICS[field]
+    bucket = event_bucket(bucket_seconds)
+    ranked = filter_events(
+        db.query(
+            bucket,
+            value.label("value"),
+            func.row_number().over(partition_by=bucket, order_by=value).label("rank"),
+            func.count().over(partition_by=bucket).label("total"),
+        ),
+        **filters,
+    ).filter(value.isnot(None)).subquery()
+    columns = [
+        func.min(ranked.c.value).filter(ranked.c.rank * 100 >= ranked.c.total * p)
+        for p in percentiles
+    ]
+    return {
+        start: {f"p{p:g}": result for p, result in zip(percentiles, values) if result is not None}
+        for start, *values in db.query(ranked.c.bucket, *columns).group_by(ranked.c.bucket)
+    }
+
+
+def finish_buckets(summary: Dict[int, list], histogram: Dict[tuple, int], bin_width: float) -> Dict[int, Dict[str, Any]]:
+    """Response buckets, in time order, from merged partials."""
+    buckets = {start: new_bucket(start, *summary[start]) for start in sorted(summary)}
+    for start, index in sorted(histogram):
+        buckets[start]["histogram"].append({
+            "lower": index * bin_width, "upper": (index + 1) * bin_width, "count": histogram[(start, index)],
+        })
+    return buckets
+
+
+def aggregate_events(db: Session, field: str, bucket_seconds: int, percentiles: List[float],
+                     bin_width: float, **filters) -> List[Dict[str, Any]]:
+    """
+    Per time bucket: event count plus count/avg/min/max, nearest-rank percentiles
+    and a fixed-width histogram of one numeric payload field. Everything is computed
+    by SQLite; only one row per bucket (and per histogram bin) comes back.
+    """
+    buckets = finish_buckets(*summarize_hot_events(db, field, bucket_seconds, bin_width, **filters), bin_width)
+    if not buckets:
+        return []
+    if percentiles:
+        for start, values in hot_percentiles(db, field, bucket_seconds, percentiles, **filters).items():
+            buckets[start]["percentiles"] = values
+    return list(buckets.values())
+
+
+def known_event_ids(db: Session, ids: List[uuid.UUID]) -> set:
+    """The ids among `ids` already stored, in the events table or the archive."""
+    known = {event_id for (event_id,) in db.query(Event.id).filter(Event.id.in_(ids))}
+    known.update(event_id for (event_id,) in db.query(ArchivedEventId.id).filter(ArchivedEventId.id.in_(ids)))
+    return known
+
+
+def write_events(rows: List[Dict[str, Any]]) -> int:
+    """
+    Persist a batch of events as one multi-row INSERT inside a single transaction,
+    together with the matching user_quiz_stats updates.
+    Rows whose id is already stored, hot or archived (redelivered idempotency keys),
+    are skipped. Returns the number of events actually inserted.
+    """
+    db = SessionLocal()
+    try:
+        unique_rows = {row["id"]: row for row in rows}
+        existing = known_event_ids(db, list(unique_rows))
+        rows = [row for event_id, row in unique_rows.items() if event_id not in existing]
+        if not rows:
+            return 0
+        db.execute(insert(Event), rows)
+        apply_quiz_completed(db, (row["payload"] for row in rows if row["event_type"] == QUIZ_COMPLETED))
+        db.commit()
+        return len(rows)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def dead_letter_events(rows: List[Dict[str, Any]], error: str):
+    db = SessionLocal()
+    try:
+        db.execute(
+            sqlite_insert(DeadLetterEvent).on_conflict_do_nothing(),
+            [{"id": row["id"], "event_type": row["event_type"], "payload": row["payload"], "error": error} for row in rows],
+        )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def write_events_one_by_one(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Fallback after a batch failed: write each row in its own transaction, so one bad
+    row can't hold back the others. Rows that fail on their own are dead-lettered.
+    Returns the rows to retry later because the database itself was unavailable.
+    """
+    retry = []
+    for row in rows:
+        try:
+            write_events([row])
+        except OperationalError:
+            retry.append(row)
+        except Exception as e:
+            logging.error(f"Dead-lettering event {row['id']}: {e}")
+            try:
+                dead_letter_events([row], str(e))
+            except Exception as dead_letter_error:
+                logging.error(f"Could not dead-letter event {row['id']}: {dead_letter_error}")
+                retry.append(row)
+    return retry
+
+
+# --- 5. Write-Behind Event Buffer ---
+class EventBufferFull(Exception):
+    pass
+
+
+class EventBuffer:
+    """
+    In-process write-behind buffer for /events/batch.
+    Events are flushed as one transaction when batch_size events are pending or
+    every flush_interval seconds, whichever comes first. Producers wait up to
+    enqueue_timeout for room when max_size events are already pending, then get
+    EventBufferFull (backpressure).
+    A batch that fails because the database is unavailable is kept for the next
+    flush; one that fails for any other reason is retried row by row, and rows that
+    still fail go to dead_letter_events instead of blocking the queue.
+    """
+
+    def __init__(self, max_size: int = 10000, batch_size: int = 500,
+                 flush_interval: float = 0.2, enqueue_timeout: float = 1.0):
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self._pending: deque = deque()
+        self._in_flight = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._space: Optional[asyncio.Event] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self):
+        return len(self._pending) + self._in_flight
+
+    async def start(self):
+        self._wakeup = asyncio.Event()
+        self._space = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def put_many(self, rows: List[Dict[str, Any]]):
+        if len(rows) > self.max_size:
+            raise EventBufferFull(f"Batch of {len(rows)} exceeds buffer capacity {self.max_size}.")
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.enqueue_timeout
+        while len(self) + len(rows) > self.max_size:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise EventBufferFull("Event buffer is full.")
+            self._space.clear()
+            self._wakeup.set()
+            try:
+                await asyncio.wait_for(self._space.wait(), remaining)
+            except asyncio.TimeoutError:
+                raise EventBufferFull("Event buffer is full.")
+        self._pending.extend(rows)
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    async def flush(self):
+        async with self._flush_lock:
+            while self._pending:
+                count = min(self.batch_size, len(self._pending))
+                batch = [self._pending.popleft() for _ in range(count)]
+                self._in_flight = count
+                try:
+                    await asyncio.to_thread(write_events, batch)
+                except OperationalError as e:
+                    # Keep the events for the next flush rather than dropping them
+                    logging.error(f"Failed to flush {count} buffered events: {e}")
+                    self._pending.extendleft(reversed(batch))
+                    return
+                except Exception as e:
+                    logging.error(f"Failed to flush {count} buffered events, writing them one by one: {e}")
+                    retry = await asyncio.to_thread(write_events_one_by_one, batch)
+                    if retry:
+                        self._pending.extendleft(reversed(retry))
+                        return
+                finally:
+                    self._in_flight = 0
+                    self._space.set()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+
+event_buffer = EventBuffer(
+    max_size=int(os.getenv("EVENT_BUFFER_MAX_SIZE", "10000")),
+    batch_size=int(os.getenv("EVENT_BATCH_SIZE", "500")),
+    flush_interval=float(os.getenv("EVENT_FLUSH_INTERVAL", "0.2")),
+    enqueue_timeout=float(os.getenv("EVENT_ENQUEUE_TIMEOUT", "1.0")),
+)
+
+
+# --- 6. Columnar Event Archive ---
+# Events older than the hot window are rolled out of SQLite into Arrow IPC files,
+# partitioned Hive-style by event type and day:
+#   <EVENT_ARCHIVE_DIR>/event_type=quiz_completed/day=2024-05-01/part-<first id>.arrow
+# Payload fields used by queries become typed columns; the full payload is kept as JSON text.
+EVENT_ARCHIVE_DIR = os.getenv("EVENT_ARCHIVE_DIR", "./event_archive")
+EVENT_HOT_RETENTION_HOURS = float(os.getenv("EVENT_HOT_RETENTION_HOURS", "168"))
+EVENT_HOT_MAX_ROWS = int(os.getenv("EVENT_HOT_MAX_ROWS", "1000000"))
+EVENT_COMPACTION_INTERVAL = float(os.getenv("EVENT_COMPACTION_INTERVAL", "0"))  # seconds; 0 (default) disables the job
+EVENT_COMPACTION_BATCH_SIZE = int(os.getenv("EVENT_COMPACTION_BATCH_SIZE", "50000"))
+
+if pa is not None:
+    ARCHIVE_SCHEMA = pa.schema([
+        ("id", pa.string()),
+        ("created_at", pa.timestamp("us", tz="UTC")),
+        ("quiz_id", pa.string()),
+        ("user_id", pa.string()),
+        ("session_id", pa.string()),
+        ("score", pa.float64()),
+        ("correct", pa.bool_()),
+        ("payload", pa.string()),
+    ])
+    ARCHIVE_PARTITIONING = ds.partitioning(pa.schema([("event_type", pa.string()), ("day", pa.string())]), flavor="hive")
+
+
+def _optional_str(value) -> Optional[str]:
+    return None if value is None else str(value)
+
+
+def write_archive_parts(rows: List[tuple]) -> int:
+    """
+    Write (id, event_type, created_at, payload) rows as one Arrow IPC file per
+    (event_type, day). File names derive from the first event id, so re-running a
+    batch that crashed before its rows were deleted overwrites instead of duplicating.
+    Returns the number of files written.
+    """
+    groups: Dict[tuple, List[tuple]] = {}
+    for row in rows:
+        groups.setdefault((row[1], row[2].date()), []).append(row)
+    for (event_type, day), group in groups.items():
+        payloads = [payload or {} for _, _, _, payload in group]
+        table = pa.Table.from_pydict({
+            "id": [str(event_id) for event_id, _, _, _ in group],
+            "created_at": [created_at for _, _, created_at, _ in group],
+            "quiz_id": [_optional_str(payload.get("quizId")) for payload in payloads],
+            "user_id": [_optional_str(payload.get("userId")) for payload in payloads],
+            "session_id": [_optional_str(payload.get("sessionId")) for payload in payloads],
+            "score": [payload.get("score") for payload in payloads],
+            "correct": [payload.get("correct") for payload in payloads],
+            "payload": [json.dumps(payload) for payload in payloads],
+        }, schema=ARCHIVE_SCHEMA)
+        directory = os.path.join(EVENT_ARCHIVE_DIR, f"event_type={quote(event_type, safe='')}", f"day={day.isoformat()}")
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"part-{group[0][0]}.arrow")
+        with pa.OSFile(f"{path}.tmp", "wb") as sink:
+            with pa.ipc.new_file(sink, ARCHIVE_SCHEMA) as writer:
+                writer.write_table(table)
+        os.replace(f"{path}.tmp", path)
+    return len(groups)
+
+
+def compact_events() -> Dict[str, int]:
+    """
+    Move events older than EVENT_HOT_RETENTION_HOURS (or beyond the newest
+    EVENT_HOT_MAX_ROWS) from SQLite into the columnar archive, in batches of
+    EVENT_COMPACTION_BATCH_SIZE. Each batch is deleted only after its files are on disk,
+    in the transaction that records its ids in archived_event_ids.
+    user_quiz_stats is already materialized, so profile stats are unaffected.
+    """
+    if pa is None:
+        return {"archived": 0, "files": 0}
+    db = SessionLocal()
+    try:
+        cutoff = datetime.utcnow() - timedelta(hours=EVENT_HOT_RETENTION_HOURS)
+        overflow = db.query(Event.created_at).order_by(Event.created_at.desc()) \
+            .offset(EVENT_HOT_MAX_ROWS).limit(1).scalar()
+        if overflow is not None:
+            cutoff = max(cutoff, overflow + timedelta(microseconds=1))
+        archived = files = 0
+        while True:
+            rows = db.query(Event.id, Event.event_type, Event.created_at, Event.payload) \
+                .filter(Event.created_at < cutoff) \
+                .order_by(Event.created_at, Event.id) \
+                .limit(EVENT_COMPACTION_BATCH_SIZE).all()
+            if not rows:
+                break
+            files += write_archive_parts(rows)
+            ids = [row[0] for row in rows]
+            db.execute(sqlite_insert(ArchivedEventId).on_conflict_do_nothing(), [{"id": event_id} for event_id in ids])
+            db.query(Event).filter(Event.id.in_(ids)).delete(synchronize_session=False)
+            db.commit()
+            archived += len(rows)
+        if archived:
+            logging.info(f"Compacted {archived} events into {files} archive files.")
+        return {"archived": archived, "files": files}
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def rebuild_archived_event_ids(db: Session):
+    """One-off backfill of archived_event_ids from archives written before the table existed."""
+    ids = scan_archive(["id"])["id"]
+    for chunk in ids.chunks:
+        if not len(chunk):
+            continue
+        db.execute(
+            sqlite_insert(ArchivedEventId).on_conflict_do_nothing(),
+            [{"id": uuid.UUID(event_id)} for event_id in chunk.to_pylist()],
+        )
+    db.commit()
+
+
+def archive_has_data(event_type: Optional[str], since: Optional[datetime]) -> bool:
+    """True if archive partitions may hold events matching event_type at or after since."""
+    if pa is None or not os.path.isdir(EVENT_ARCHIVE_DIR):
+        return False
+    first_day = f"day={to_utc_naive(since).date().isoformat()}" if since is not None else ""
+    for type_dir in os.scandir(EVENT_ARCHIVE_DIR):
+        if event_type is not None and type_dir.name != f"event_type={quote(event_type, safe='')}":
+            continue
+        if type_dir.is_dir() and any(day_dir.name >= first_day for day_dir in os.scandir(type_dir.path)):
+            return True
+    return False
+
+
+def scan_archive(columns: List[str], event_type: Optional[str] = None, quiz_id: Optional[str] = None,
+                 user_id: Optional[str] = None, since: Optional[datetime] = None,
+                 until: Optional[datetime] = None):
+    """
+    Read only the requested columns from the archive, memory-mapped. Partition
+    directories outside event_type/day are pruned before any file is opened.
+    """
+    dataset = ds.dataset(
+        EVENT_ARCHIVE_DIR,
+        format="ipc",
+        partitioning=ARCHIVE_PARTITIONING,
+        filesystem=pafs.LocalFileSystem(use_mmap=True),
+        exclude_invalid_files=True,
+    )
+    conditions = []
+    if event_type is not None:
+        conditions.append(ds.field("event_type") == event_type)
+    if quiz_id is not None:
+        conditions.append(ds.field("quiz_id") == quiz_id)
+    if user_id is not None:
+        conditions.append(ds.field("user_id") == user_id)
+    if since is not None:
+        since = to_utc_naive(since)
+        conditions.append(ds.field("day") >= since.date().isoformat())
+        conditions.append(ds.field("created_at") >= pa.scalar(since, pa.timestamp("us", tz="UTC")))
+    if until is not None:
+        until = to_utc_naive(until)
+        conditions.append(ds.field("day") <= until.date().isoformat())
+        conditions.append(ds.field("created_at") < pa.scalar(until, pa.timestamp("us", tz="UTC")))
+    condition = None
+    for expression in conditions:
+        condition = expression if condition is None else condition & expression
+    return dataset.to_table(columns=columns, filter=condition)
+
+
+def latest_archived_events(limit: int, **filters) -> List[Dict[str, Any]]:
+    """The newest `limit` archived events matching filters, shaped like Event rows."""
+    archived = scan_archive(["id", "event_type", "created_at", "payload"], **filters)
+    if not archived.num_rows:
+        return []
+    newest = archived.take(pc.select_k_unstable(archived, limit, sort_keys=[("created_at", "descending")]))
+    return [
+        {
+            "id": uuid.UUID(row["id"]),
+            "event_type": row["event_type"],
+            "created_at": to_utc_naive(row["created_at"]),
+            "payload": json.loads(row["payload"]),
+        }
+        for row in newest.to_pylist()
+    ]
+
+
+def aggregate_archived_events(db: Session, field: str, bucket_seconds: int, percentiles: List[float],
+                              bin_width: float, **filters) -> List[Dict[str, Any]]:
+    """
+    Same result as aggregate_events, for ranges that reach into the archive.
+    Each side is reduced to partial aggregates where it lives (SQLite for the hot
+    rows, Arrow compute kernels for the archived columns) and only those are merged,
+    so buckets that straddle the hot/archive boundary are still exact.
+    Percentiles can't be merged from partials: a bucket held by one side only takes
+    them from that side, and only for buckets held by both are the hot values of
+    those buckets fetched and ranked together with the archived ones.
+    """
+    summary, histogram = summarize_hot_events(db, field, bucket_seconds, bin_width, **filters)
+    hot_buckets = set(summary)
+
+    archived = scan_archive(["created_at", field], **filters)
+    epoch_seconds = pc.divide(archived.column("created_at").cast(pa.int64()), 1_000_000)
+    table = pa.table({
+        "bucket": pc.multiply(pc.divide(epoch_seconds, bucket_seconds), bucket_seconds),
+        "value": archived.column(field).cast(pa.float64()),
+    })
+    archived_summary = table.group_by("bucket").aggregate([
+        ([], "count_all"), ("value", "count"), ("value", "sum"), ("value", "min"), ("value", "max"),
+    ])
+    for row in archived_summary.to_pylist():
+        partial = [row["count_all"], row["value_count"], row["value_sum"], row["value_min"], row["value_max"]]
+        merged = summary.get(row["bucket"])
+        if merged is None:
+            summary[row["bucket"]] = partial
+            continue
+        merged[0] += partial[0]
+        merged[1] += partial[1]
+        merged[2] = (merged[2] or 0.0) + (partial[2] or 0.0) if merged[1] else None
+        merged[3] = min((v for v in (merged[3], partial[3]) if v is not None), default=None)
+        merged[4] = max((v for v in (merged[4], partial[4]) if v is not None), default=None)
+
+    measured = table.filter(pc.is_valid(table["value"])).sort_by([("bucket", "ascending"), ("value", "ascending")])
+    bins = pa.table({"bucket": measured["bucket"], "bin": pc.floor(pc.divide(measured["value"], bin_width))})
+    for row in bins.group_by(["bucket", "bin"]).aggregate([([], "count_all")]).to_pylist():
+        key = (row["bucket"], row["bin"])
+        histogram[key] = histogram.get(key, 0) + row["count_all"]
+
+    buckets = finish_buckets(summary, histogram, bin_width)
+    if not buckets or not percentiles:
+        return list(buckets.values())
+
+    # Archived measured values per bucket, as (start, length) runs of the sorted table
+    runs, offset = {}, 0
+    for row in measured.group_by("bucket").aggregate([([], "count_all")]).sort_by("bucket").to_pylist():
+        runs[row["bucket"]] = (offset, row["count_all"])
+        offset += row["count_all"]
+    shared = sorted(hot_buckets & set(runs))
+
+    for start, values in hot_percentiles(db, field, bucket_seconds, percentiles, **filters).items():
+        if start not in runs:
+            buckets[start]["percentiles"] = values
+    positions, owners = [], []
+    for start, (first, length) in runs.items():
+        if start in hot_buckets:
+            continue
+        for p in percentiles:
+            positions.append(first + max(math.ceil(length * p / 100), 1) - 1)
+            owners.append((buckets[start], f"p{p:g}"))
+    if positions:
+        for (entry, key), value in zip(owners, measured["value"].take(positions).to_pylist()):
+            entry["percentiles"][key] = value
+
+    if shared:
+        value = EVENT_METRICS[field]
+        bucket = event_bucket(bucket_seconds)
+        window = {
+            **filters,
+            "since": max(filter(None, [to_utc_naive(filters.get("since")), datetime.utcfromtimestamp(shared[0])])),
+            "until": min(filter(None, [to_utc_naive(filters.get("until")),
+                                       datetime.utcfromtimestamp(shared[-1] + bucket_seconds)])),
+        }
+        hot_values: Dict[int, List[float]] = {start: [] for start in shared}
+        rows = filter_events(db.query(bucket, value), **window).filter(value.isnot(None), bucket.in_(shared))
+        for start, measurement in rows:
+            hot_values[start].append(measurement)
+        for start in shared:
+            first, length = runs[start]
+            ordered = sorted(measured["value"].slice(first, length).to_pylist() + hot_values[start])
+            buckets[start]["percentiles"] = {
+                f"p{p:g}": ordered[max(math.ceil(len(ordered) * p / 100), 1) - 1] for p in percentiles
+            }
+    return list(buckets.values())
+
+
+class EventCompactor:
+    """Runs compact_events in a worker thread every interval seconds."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if pa is None:
+            logging.warning("pyarrow is not installed; event compaction is disabled.")
+            return
+        if self.interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.to_thread(compact_events)
+            except Exception as e:
+                logging.error(f"Event compaction failed: {e}")
+            await asyncio.sleep(self.interval)
+
+
+event_compactor = EventCompactor(EVENT_COMPACTION_INTERVAL)
+
+
+# --- 7. Item Analysis ---
+# Classical test theory statistics per question, computed over every quiz_completed
+# event of a quiz (hot rows and archive). Submissions are decoded once into dense
+# arrays (submission x question), then every statistic is a handful of NumPy reductions.
+ITEM_GROUP_FRACTION = 0.27  # Kelley's upper/lower group size for the discrimination index
+# Answer labels are client-sent; past this many distinct ones the rest share one "other" code
+ITEM_MAX_OPTION_LABELS = 1000
+ITEM_OTHER_OPTION = "(other)"
+_RESULT_TYPES = {bool, int}
+_RESULT_VALUES = {0, 1}
+_ANSWER_TYPES = {str}
+
+
+class _Codes(dict):
+    """Dense integer codes in order of first appearance; codes.__getitem__ never misses."""
+
+    def __missing__(self, key):
+        code = self[key] = len(self)
+        return code
+
+
+class _CappedCodes(_Codes):
+    """_Codes that stops growing at `limit`: later keys all get the code of `other`."""
+
+    def __init__(self, limit: int, other: str):
+        super().__init__()
+        self.limit, self.other = limit, other
+
+    def __missing__(self, key):
+        if len(self) < self.limit - 1:
+            return super().__missing__(key)
+        # Not stored under `key`, so junk labels don't pile up
+        code = self.get(self.other)
+        if code is None:
+            code = self[self.other] = len(self)
+        return code
+
+
+def item_payload_ok(payload: Any) -> bool:
+    """
+    Whether a submission can be decoded: "results" maps to bool/0/1, "answers" to
+    string labels and the score (if any) is a number. Checks stay at C level (set/map).
+    """
+    if not isinstance(payload, dict):
+        return False
+    results = payload.get("results") or {}
+    answers = payload.get("answers") or {}
+    if not isinstance(results, dict) or not isinstance(answers, dict):
+        return False
+    if not set(map(type, results.values())) <= _RESULT_TYPES or not set(results.values()) <= _RESULT_VALUES:
+        return False
+    if not set(map(type, answers.values())) <= _ANSWER_TYPES:
+        return False
+    return payload.get("score") is None or quiz_score(payload) is not None
+
+
+def load_item_matrix(payloads: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    One pass over submission payloads into:
+      choice  int16 [n, q]  option code per question, -1 = unanswered
+      correct int8  [n, q]  1/0 from payload "results", -1 = not graded
+      score   float [n]     payload score, NaN if missing
+    Per submission only a few C-level extend() calls run: the column layout of an
+    answers/results dict is looked up by its key tuple (submissions of one quiz share
+    a handful of layouts), and option labels are coded with map(). The dense arrays
+    are then filled with one scatter each.
+    Columns are the graded question ids in "results" (written by the API from the answer
+    key); answers to anything else are client junk and are skipped, as are whole
+    submissions that fail item_payload_ok (counted in "skipped").
+    """
+    questions, layouts, answer_layouts = _Codes(), {}, {}
+    options = _CappedCodes(ITEM_MAX_OPTION_LABELS, ITEM_OTHER_OPTION)
+    answer_columns, answer_codes, answer_lengths = array("h"), array("h"), array("l")
+    result_columns, result_values, result_lengths = array("h"), array("b"), array("l")
+    scores = array("d")
+    skipped = 0
+
+    def columns(keys: tuple):
+        layout = layouts.get(keys)
+        if layout is None:
+            if len(layouts) > 10000:
+                layouts.clear()
+            layout = layouts[keys] = array("h", map(questions.__getitem__, keys))
+        return layout
+
+    for payload in payloads:
+        if not item_payload_ok(payload):
+            skipped += 1
+            continue
+        # results first: producers list every question in quiz order there
+        results = payload.get("results") or {}
+        result_keys = tuple(results)
+        result_columns.extend(columns(result_keys))
+        result_values.extend(results.values())
+        result_lengths.append(len(results))
+        answers = payload.get("answers") or {}
+        answer_keys = tuple(answers)
+        layout = answer_layouts.get((result_keys, answer_keys))
+        if layout is None:
+            if len(answer_layouts) > 10000:
+                answer_layouts.clear()
+            graded = set(result_keys)
+            keep = [key in graded for key in answer_keys]
+            layout = answer_layouts[(result_keys, answer_keys)] = (
+                array("h", (questions[key] for key in compress(answer_keys, keep))), keep
+            )
+        answer_columns.extend(layout[0])
+        answer_codes.extend(map(options.__getitem__, compress(answers.values(), layout[1])))
+        answer_lengths.append(len(layout[0]))
+        scores.append(math.nan if payload.get("score") is None else quiz_score(payload))
+
+    n, q = len(scores), len(questions)
+    choice = np.full((n, q), -1, dtype=np.int16)
+    choice[np.repeat(np.arange(n), answer_lengths), np.frombuffer(answer_columns, dtype=np.int16)] = np.frombuffer(answer_codes, dtype=np.int16)
+    correct = np.full((n, q), -1, dtype=np.int8)
+    correct[np.repeat(np.arange(n), result_lengths), np.frombuffer(result_columns, dtype=np.int16)] = np.frombuffer(result_values, dtype=np.int8)
+    return {
+        "questions": list(questions),
+        "options": list(options),
+        "choice": choice,
+        "correct": correct,
+        "score": np.frombuffer(scores, dtype=np.float64),
+        "skipped": skipped,
+    }
+
+
+def analyze_items(matrix: Dict[str, Any], bin_width: float, percentiles: List[float]) -> Dict[str, Any]:
+    choice, correct, score = matrix["choice"], matrix["correct"], matrix["score"]
+    n = len(score)
+    scored = ~np.isnan(score)
+
+    # Upper/lower groups by total score, for the discrimination index and distractor rates
+    ranked = np.flatnonzero(scored)[np.argsort(score[scored], kind="stable")]
+    group = max(int(round(len(ranked) * ITEM_GROUP_FRACTION)), 1) if len(ranked) else 0
+    lower, upper = ranked[:group], ranked[len(ranked) - group:]
+
+    graded = correct >= 0
+    hits = np.where(graded, correct, 0).astype(np.float64)
+    graded_count = graded.sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        difficulty = hits.sum(axis=0) / graded_count
+        upper_p = hits[upper].sum(axis=0) / graded[upper].sum(axis=0)
+        lower_p = hits[lower].sum(axis=0) / graded[lower].sum(axis=0)
+        # Point-biserial: Pearson correlation of item correctness with total score, over graded+scored rows
+        mask = (graded & scored[:, None]).astype(np.float64)
+        x = np.nan_to_num(score)[:, None] * mask
+        m = mask.sum(axis=0)
+        mean_x, mean_y = x.sum(axis=0) / m, (hits * mask).sum(axis=0) / m
+        cov = (x * hits).sum(axis=0) / m - mean_x * mean_y
+        var_x = (x * x).sum(axis=0) / m - mean_x ** 2
+        var_y = mean_y - mean_y ** 2  # hits are 0/1
+        point_biserial = cov / np.sqrt(var_x * var_y)
+
+    def _value(array, index):
+        value = float(array[index])
+        return None if math.isnan(value) or math.isinf(value) else value
+
+    items = []
+    labels = matrix["options"]
+    answered = (choice >= 0).sum(axis=0)
+    for column, question_id in enumerate(matrix["questions"]):
+        codes = choice[:, column]
+        counts = np.bincount(codes[codes >= 0], minlength=len(labels))
+        upper_codes, lower_codes = codes[upper], codes[lower]
+        upper_counts = np.bincount(upper_codes[upper_codes >= 0], minlength=len(labels))
+        lower_counts = np.bincount(lower_codes[lower_codes >= 0], minlength=len(labels))
+        # An option is the key if most of the graded submissions that chose it were correct
+        chosen = (codes >= 0) & graded[:, column]
+        key_total = np.bincount(codes[chosen], minlength=len(labels))
+        key_hits = np.bincount(codes[chosen], weights=hits[chosen, column], minlength=len(labels))
+        items.append({
+            "question_id": question_id,
+            "answered": int(answered[column]),
+            "unanswered_rate": 1 - answered[column] / n if n else 0.0,
+            "graded": int(graded_count[column]),
+            "difficulty": _value(difficulty, column),
+            "discrimination": _value(upper_p - lower_p, column),
+            "point_biserial": _value(point_biserial, column),
+            "options": [
+                {
+                    "option": labels[code],
+                    "count": int(counts[code]),
+                    "rate": counts[code] / n,
+                    "upper_rate": upper_counts[code] / len(upper) if len(upper) else 0.0,
+                    "lower_rate": lower_counts[code] / len(lower) if len(lower) else 0.0,
+                    "is_key": bool(key_total[code] and key_hits[code] * 2 > key_total[code]),
+                }
+                for code in np.flatnonzero(counts)  # options nobody picked for this question are unknown
+            ],
+        })
+
+    distribution: Dict[str, Any] = {"percentiles": {}, "histogram": []}
+    values = score[scored]
+    if len(values):
+        distribution["mean"] = float(values.mean())
+        distribution["std"] = float(values.std())
+        # Nearest-rank, like the aggregate endpoints
+        ordered = np.sort(values)
+        for p in percentiles:
+            distribution["percentiles"][f"p{p:g}"] = float(ordered[max(math.ceil(len(ordered) * p / 100), 1) - 1])
+        bins, counts = np.unique(np.floor(values / bin_width), return_counts=True)
+        distribution["histogram"] = [
+            {"lower": float(b * bin_width), "upper": float((b + 1) * bin_width), "count": int(c)}
+            for b, c in zip(bins, counts)
+        ]
+    return {"submissions": n, "scores": distribution, "items": items}
+
+
+def item_analysis(db: Session, quiz_id: str, bin_width: float, percentiles: List[float]) -> Dict[str, Any]:
+    # Raw payload text: decoding it here skips the ORM's per-row JSON processing
+    hot = filter_events(select(cast(Event.payload, String)), event_type=QUIZ_COMPLETED, quiz_id=quiz_id)
+    sources = [db.execute(hot).scalars()]
+    if archive_has_data(QUIZ_COMPLETED, None):
+        archived = scan_archive(["payload"], event_type=QUIZ_COMPLETED, quiz_id=quiz_id)["payload"]
+        sources.extend(chunk.to_pylist() for chunk in archived.chunks)
+    matrix = load_item_matrix(json.loads(payload) for source in sources for payload in source if payload)
+    return {"quiz_id": quiz_id, "skipped_submissions": matrix["skipped"], **analyze_items(matrix, bin_width, percentiles)}
+
+
+# --- 8. Database Session & Startup ---
 @app.on_event("startup")
 def on_startup():
     Base.metadata.create_all(bind=engine)
+    # create_all skips new indexes on tables that already exist, and reflection can't
+    # see expression indexes, so let SQLite do the existence check
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                conn.execute(CreateIndex(index, if_not_exists=True))
+    ReadSessionLocal.configure(bind=create_read_engine(DATABASE_URL, engine))
+    db = SessionLocal()
+    try:
+        if db.query(UserQuizStats).first() is None and db.query(Event).first() is not None:
+            rebuild_user_stats(db)
+        if db.query(ArchivedEventId).first() is None and archive_has_data(None, None):
+            rebuild_archived_event_ids(db)
+    finally:
+        db.close()
+
+
+@app.on_event("startup")
+async def start_event_buffer():
+    await event_buffer.start()
+
+
+@app.on_event("shutdown")
+async def stop_event_buffer():
+    await event_buffer.stop()
+
+
+@app.on_event("startup")
+async def start_event_compactor():
+    event_compactor.start()
+
+
+@app.on_event("shutdown")
+async def stop_event_compactor():
+    await event_compactor.stop()
 
 
 def get_db():
@@ -68,22 +1167,179 @@ def get_db():
         db.close()
 
 
-# --- 5. API Endpoints ---
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+# --- 9. API Endpoints ---
 @app.post("/events", response_model=EventResponseSchema, status_code=201)
 def record_event(event_data: EventSchema, db: Session = Depends(get_db)):
+    reason = invalid_event_reason(event_data.event_type, event_data.payload)
+    if reason is not None:
+        raise HTTPException(status_code=422, detail=reason)
+    if event_data.id is not None:
+        existing = db.query(Event).filter(Event.id == event_data.id).first()
+        if existing is not None:
+            return existing
+        if known_event_ids(db, [event_data.id]):
+            # Already recorded and since compacted into the archive; acknowledge without re-applying
+            return {"id": event_data.id, "event_type": event_data.event_type,
+                    "payload": event_data.payload, "created_at": None}
     db_event = Event(
+        id=event_data.id or uuid.uuid4(),
         event_type=event_data.event_type,
         payload=event_data.payload
     )
     db.add(db_event)
+    if event_data.event_type == QUIZ_COMPLETED:
+        apply_quiz_completed(db, [event_data.payload])
     db.commit()
     db.refresh(db_event)
     return db_event
 
 
+@app.post("/events/batch", status_code=202)
+async def record_events_batch(batch: EventBatchSchema, response: Response, durable: bool = False):
+    """
+    Accept many events at once. By default they are queued in the write-behind buffer
+    and persisted asynchronously in multi-row transactions (202).
+    With ?durable=true the batch is committed before responding (201), which is what
+    at-least-once senders with idempotency keys need.
+    Events are validated before anything is queued; a batch with invalid events is
+    rejected as a whole (422) with their indexes and reasons.
+    """
+    invalid = [
+        {"index": index, "reason": reason}
+        for index, event in enumerate(batch.events)
+        if (reason := invalid_event_reason(event.event_type, event.payload)) is not None
+    ]
+    if invalid:
+        raise HTTPException(status_code=422, detail=invalid)
+    rows = [
+        {"id": event.id or uuid.uuid4(), "event_type": event.event_type, "payload": event.payload}
+        for event in batch.events
+    ]
+    if durable:
+        inserted = await asyncio.to_thread(write_events, rows)
+        response.status_code = 201
+        return {"accepted": len(rows), "inserted": inserted, "ids": [row["id"] for row in rows]}
+    try:
+        await event_buffer.put_many(rows)
+    except EventBufferFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    return {"accepted": len(rows), "ids": [row["id"] for row in rows]}
+
+
 @app.get("/events", response_model=List[EventResponseSchema])
-def get_all_events(db: Session = Depends(get_db), limit: int = 100):
-    return db.query(Event).order_by(Event.created_at.desc()).limit(limit).all()
+def get_all_events(
+    db: Session = Depends(get_read_db),
+    limit: int = QueryParam(100, ge=1, le=10000),
+    event_type: Optional[str] = None,
+    quiz_id: Optional[str] = None,
+    user_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+):
+    """
+    Latest events, optionally filtered by type, payload quizId/userId and a [since, until) range.
+    Archived events are older than every hot one, so they only top up a short page.
+    """
+    query = filter_events(db.query(Event), event_type, quiz_id, user_id, since, until)
+    events = query.order_by(Event.created_at.desc()).limit(limit).all()
+    if len(events) < limit and archive_has_data(event_type, since):
+        events += latest_archived_events(
+            limit - len(events), event_type=event_type, quiz_id=quiz_id, user_id=user_id, since=since, until=until,
+        )
+    return events
+
+
+def parse_percentiles(percentiles: str) -> List[float]:
+    try:
+        points = [float(p) for p in percentiles.split(",") if p.strip()]
+    except ValueError:
+        raise HTTPException(status_code=422, detail="percentiles must be comma-separated numbers")
+    if any(not 0 < p <= 100 for p in points):
+        raise HTTPException(status_code=422, detail="percentiles must be in (0, 100]")
+    return points
+
+
+@app.get("/events/aggregate", response_model=EventAggregateSchema)
+def aggregate_events_endpoint(
+    db: Session = Depends(get_read_db),
+    event_type: Optional[str] = QUIZ_COMPLETED,
+    quiz_id: Optional[str] = None,
+    user_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    field: Literal["score", "correct"] = "score",
+    bucket: int = QueryParam(3600, ge=1, description="Bucket width in seconds"),
+    percentiles: str = QueryParam("50,90,99", description="Comma-separated, each in (0, 100]"),
+    bin_width: float = QueryParam(10.0, gt=0, description="Histogram bin width"),
+):
+    """
+    Time-bucketed counts, averages, percentiles and histograms of a payload field
+    (score of quiz_completed events by default), computed server-side: in SQL for
+    the hot window, over the columnar archive when the range reaches into it.
+    """
+    points = parse_percentiles(percentiles)
+    aggregate = aggregate_archived_events if archive_has_data(event_type, since) else aggregate_events
+    buckets = aggregate(
+        db, field, bucket, points, bin_width,
+        event_type=event_type, quiz_id=quiz_id, user_id=user_id, since=since, until=until,
+    )
+    return {"field": field, "bucket_seconds": bucket, "buckets": buckets}
+
+
+@app.get("/quizzes/{quiz_id}/item-analysis", response_model=ItemAnalysisSchema)
+def read_item_analysis(
+    quiz_id: str,
+    db: Session = Depends(get_read_db),
+    bin_width: float = QueryParam(10.0, gt=0, description="Score histogram bin width"),
+    percentiles: str = QueryParam("25,50,75,90", description="Comma-separated, each in (0, 100]"),
+):
+    """
+    Per-question difficulty, discrimination (upper-lower 27% and point-biserial),
+    option/distractor rates and the score distribution of a quiz's submissions.
+    Correctness comes from the per-question "results" the producers attach.
+    """
+    if np is None:
+        raise HTTPException(status_code=501, detail="numpy is not installed")
+    return item_analysis(db, quiz_id, bin_width, parse_percentiles(percentiles))
+
+
+@app.post("/events/compact")
+async def compact_events_endpoint():
+    """Run a compaction pass now instead of waiting for the background job."""
+    if pa is None:
+        raise HTTPException(status_code=501, detail="pyarrow is not installed")
+    return await asyncio.to_thread(compact_events)
+
+
+@app.get("/users/{user_id}/stats", response_model=UserStatsSchema)
+def get_user_stats(user_id: str, db: Session = Depends(get_read_db)):
+    rows = db.query(UserQuizStats).filter(UserQuizStats.user_id == user_id).all()
+    attempts = sum(row.attempts for row in rows)
+    total_score = sum(row.total_score for row in rows)
+    return {
+        "user_id": user_id,
+        "quizzes_taken": attempts,
+        "average_score": total_score / attempts if attempts else 0.0,
+        "best_score": max((row.best_score for row in rows), default=0.0),
+        "quizzes": [
+            {
+                "quiz_id": row.quiz_id,
+                "attempts": row.attempts,
+                "average_score": row.total_score / row.attempts if row.attempts else 0.0,
+                "best_score": row.best_score,
+                "last_score": row.last_score,
+            }
+            for row in rows
+        ],
+    }
 
 
 @app.get("/")
@@ -0,0 +1,74 @@
+"""
+bench_ingest.py
+---------------
+Compares analytics ingestion throughput of one-event-per-request POST /events
+against POST /events/batch (write-behind buffer, multi-row transactions).
+
+Runs in-process against a throwaway SQLite file, so the real analytics.db is untouched:
+
+    python bench_ingest.py --events 2000 --batch-size 200
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+# Must be set before analytics_app is imported so its engine points at the scratch DB
+_tmp_dir = tempfile.mkdtemp(prefix="analytics-bench-")
+os.environ["ANALYTICS_DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp_dir, 'bench.db')}"
+
+import httpx  # noqa: E402
+import analytics_app  # noqa: E402
+
+
+def make_event(i: int) -> dict:
+    return {
+        "event_type": "quiz_completed",
+        "payload": {"quizId": f"quiz-{i % 10}", "userId": f"user-{i % 500}", "score": float(i % 100), "answers": {}},
+    }
+
+
+async def bench_single(client: httpx.AsyncClient, n: int) -> float:
+    start = time.perf_counter()
+    for i in range(n):
+        response = await client.post("/events", json=make_event(i))
+        response.raise_for_status()
+    return time.perf_counter() - start
+
+
+async def bench_batch(client: httpx.AsyncClient, n: int, batch_size: int) -> float:
+    start = time.perf_counter()
+    for offset in range(0, n, batch_size):
+        events = [make_event(i) for i in range(offset, min(offset + batch_size, n))]
+        response = await client.post("/events/batch", json={"events": events})
+        response.raise_for_status()
+    # Include the time it takes for everything to actually reach the database
+    await analytics_app.event_buffer.flush()
+    return time.perf_counter() - start
+
+
+async def main(n: int, batch_size: int):
+    analytics_app.on_startup()
+    await analytics_app.start_event_buffer()
+    transport = httpx.ASGITransport(app=analytics_app.app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            single = await bench_single(client, n)
+            batched = await bench_batch(client, n, batch_size)
+    finally:
+        await analytics_app.stop_event_buffer()
+
+    print(f"events={n} batch_size={batch_size}")
+    print(f"single  POST /events       : {single:8.3f}s  {n / single:10.1f} events/s")
+    print(f"batched POST /events/batch : {batched:8.3f}s  {n / batched:10.1f} events/s")
+    print(f"speedup: {single / batched:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main(args.events, args.batch_size))
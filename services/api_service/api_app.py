@@ -1,16 +1,34 @@
+import asyncio
+import base64
+import binascii
+import hashlib
 import httpx
+import os
+import random
+import sys
+import threading
+import time
 import uuid
+from collections import OrderedDict, deque
+from urllib.parse import quote
 from datetime import datetime, timedelta, timezone
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Header, Query, Request, Response, status
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware # <--- IMPORT THIS
-from pydantic import BaseModel
-from typing import List, Dict, Any, Annotated
-from sqlalchemy import create_engine, Column, String, JSON, ForeignKey, Integer
-from sqlalchemy.orm import sessionmaker, Session, declarative_base, relationship
+from pydantic import BaseModel, ValidationError, field_validator
+from typing import List, Dict, Any, Annotated, AsyncIterator, Iterator, Literal
+from sqlalchemy import delete, func, insert, select, update, Column, String, JSON, ForeignKey, Integer, Float
+from sqlalchemy.orm import sessionmaker, Session, declarative_base, relationship, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
 from jose import JWTError, jwt
-from argon2 import PasswordHasher
+
+from password_hashing import HashingOverloaded, PasswordHashingPool
+
+# Shared SQLite engine setup lives in services/common
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from sqlite_db import create_sqlite_engine, create_read_engine, create_async_sqlite_engine  # noqa: E402
 
 # --- 1. Security & Auth Setup ---
 SECRET_KEY = "your-super-secret-key"
@@ -20,10 +38,16 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 30
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/users/login")
 
 # --- 2. Configuration & Database Setup ---
-ANALYTICS_SERVICE_URL = "http://127.0.0.1:8000/events"
+ANALYTICS_BASE_URL = os.getenv("ANALYTICS_BASE_URL", "http://127.0.0.1:8000")
 DATABASE_URL = "sqlite:///./api.db"
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+engine = create_sqlite_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Read-only endpoints; rebound to a read-only connection pool once the schema exists
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# async def endpoints use this one, so their queries await instead of blocking the event loop.
+# Sync endpoints keep SessionLocal: FastAPI already runs them in its threadpool.
+async_engine = create_async_sqlite_engine(DATABASE_URL)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
 # --- 3. Database Models (Tables) ---
@@ -41,7 +65,7 @@ class Question(Base):
     question_text = Column(String, nullable=False)
     options = Column(JSON)
     correct_answer = Column(String)
-    quiz_id = Column(String, ForeignKey("quizzes.id"))
+    quiz_id = Column(String, ForeignKey("quizzes.id"), index=True)
     quiz = relationship("Quiz", back_populates="questions")
 
 class User(Base):
@@ -51,6 +75,28 @@ class User(Base):
     hashed_password = Column(String, nullable=False)
     role = Column(String, default="user") 
 
+class OutboxEvent(Base):
+    """Analytics events waiting to be delivered. The id doubles as the idempotency key."""
+    __tablename__ = "analytics_outbox"
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    event_type = Column(String, nullable=False)
+    payload = Column(JSON)
+    created_at = Column(Float, nullable=False, default=time.time)
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(Float, nullable=False, default=0.0, index=True)
+    last_error = Column(String)
+
+class OutboxDeadLetter(Base):
+    """Outbox events given up on: rejected by the analytics service or out of attempts."""
+    __tablename__ = "analytics_outbox_dead_letter"
+    id = Column(String, primary_key=True)
+    event_type = Column(String, nullable=False)
+    payload = Column(JSON)
+    created_at = Column(Float, nullable=False)
+    attempts = Column(Integer, nullable=False)
+    last_error = Column(String)
+    failed_at = Column(Float, nullable=False, default=time.time)
+
 # --- 4. Pydantic Schemas ---
 class QuestionBase(BaseModel):
     question_text: str
@@ -77,10 +123,64 @@ class QuizSchema(QuizBase):
     questions: List[QuestionSchema] = []
     class Config: from_attributes = True
 
+class QuizSummarySchema(QuizBase):
+    id: str
+    question_count: int = 0
+    class Config: from_attributes = True
+
+class QuestionImport(QuestionCreate):
+    id: str | None = None  # kept when present, so exports re-import with the same ids
+
+class QuizImport(QuizBase):
+    id: str | None = None
+    questions: List[QuestionImport] = []
+
+class QuizUpdate(QuizBase):
+    # Questions with an id are matched against the quiz's current questions; the rest are new
+    questions: List[QuestionImport]
+
+class QuestionPatch(BaseModel):
+    id: str | None = None  # None -> insert (all fields required)
+    question_text: str | None = None
+    options: Dict[str, str] | None = None
+    correct_answer: str | None = None
+
+class QuizPatch(BaseModel):
+    title: str | None = None
+    description: str | None = None
+    time_limit_seconds: int | None = None
+    questions: List[QuestionPatch] = []
+    delete_questions: List[str] = []
+
+    @field_validator("title")
+    @classmethod
+    def title_not_null(cls, title):
+        # Omitted means "leave unchanged"; an explicit null would store a quiz QuizSchema can't serialize
+        if title is None:
+            raise ValueError("title cannot be set to null")
+        return title
+
+class QuizChanges(BaseModel):
+    id: str
+    inserted: List[str] = []
+    updated: List[str] = []
+    deleted: List[str] = []
+
+class ImportResult(BaseModel):
+    imported_quizzes: int = 0
+    imported_questions: int = 0
+    skipped: int = 0
+    error_count: int = 0
+    errors: List[Dict[str, Any]] = []  # first IMPORT_MAX_REPORTED_ERRORS as {"line", "error"}
+
+class QuizPage(BaseModel):
+    items: List[QuizSchema] | List[QuizSummarySchema]
+    next_cursor: str | None = None
+
 class SubmissionSchema(BaseModel):
     userId: str
     answers: Dict[str, str]
-    score: float #
+    score: float | None = None # Ignored; the score is computed server-side
 
 class UserSchema(BaseModel):
     username: str
@@ -89,6 +189,11 @@ class UserSchema(BaseModel):
 class UserCreate(UserSchema):
     password: str
 
+class Principal(UserSchema):
+    """The authenticated user handed to endpoints; plain data, so it can be cached across requests."""
+    id: str
+    role: str | None = None
+
 class Token(BaseModel):
     access_token: str
     token_type: str
@@ -97,16 +202,30 @@ class TokenData(BaseModel):
     username: str | None = None
 
 # --- 5. Auth Helper Functions ---
-ph = PasswordHasher()
-
-def verify_password(plain_password, hashed_password):
-    try:
-        return ph.verify(hashed_password, plain_password)
-    except Exception:
-        return False
+# Argon2 runs in a bounded process pool (see password_hashing.py), never on the event loop
+password_hasher = PasswordHashingPool()
 
 def get_password_hash(password):
-    return ph.hash(password)
+    # Sync callers only: they run in the threadpool, which blocks here instead of the loop
+    return password_hasher.hash_blocking(password)
+
+async def authenticate_user(db: AsyncSession, username: str, password: str):
+    user = await get_user_async(db, username=username)
+    if not user:
+        return None
+    # Give the pooled connection back while the hash runs, or a login storm exhausts the pool
+    db.expunge(user)
+    await db.rollback()
+    matches, new_hash = await password_hasher.verify(user.hashed_password, password)
+    if not matches:
+        return None
+    if new_hash:
+        # Stored hash predates the current ARGON2_* parameters: upgrade it now that we know the password
+        await db.execute(update(User).where(User.id == user.id).values(hashed_password=new_hash))
+        await db.commit()
+        principal_cache.invalidate(user.username)
+        user.hashed_password = new_hash
+    return user
 
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
     to_encode = data.copy()
@@ -118,44 +237,696 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+class VersionedTTLCache:
+    """
+    Thread-safe LRU + TTL cache. Each entry is tagged with the version of its source
+    (e.g. the quiz or user it was built from); writers bump a source's version after
+    committing, so older entries fail their next lookup and a reader that raced a
+    write can't store what it read.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple] = OrderedDict()  # key -> (source, version, expires_at, value)
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def version(self, source: str) -> int:
+        with self._lock:
+            return self._versions.get(source, 0)
+
+    def get(self, key: str) -> Any | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] != self._versions.get(entry[0], 0) or entry[2] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[3]
+
+    def put(self, key: str, source: str, version: int, value: Any, ttl: float | None = None):
+        """Store value unless `source` changed since the caller read `version`. ttl can only shorten self.ttl."""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else min(ttl, self.ttl))
+        with self._lock:
+            if version == self._versions.get(source, 0):
+                self._entries[key] = (source, version, expires_at, value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+
+    def invalidate(self, source: str):
+        with self._lock:
+            self._versions[source] = self._versions.get(source, 0) + 1
+            # Entries keyed by their source go now; the rest fail the version check on lookup
+            self._entries.pop(source, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+# Verified bearer token -> Principal (versioned per username), so authenticated
+# requests skip jwt.decode and the users query. An entry never outlives its token's
+# exp, nor PRINCIPAL_CACHE_TTL: other workers' caches only learn about user changes
+# through that TTL.
+PRINCIPAL_CACHE_MAX_ENTRIES = int(os.getenv("PRINCIPAL_CACHE_MAX_ENTRIES", "10000"))
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "30.0"))
+
+principal_cache = VersionedTTLCache(max_entries=PRINCIPAL_CACHE_MAX_ENTRIES, ttl=PRINCIPAL_CACHE_TTL)
+
 # --- 6. CRUD Functions ---
+QUIZ_MAX_PAGE_SIZE = int(os.getenv("QUIZ_MAX_PAGE_SIZE", "1000"))
+
 def get_quiz(db: Session, quiz_id: str):
     return db.query(Quiz).filter(Quiz.id == quiz_id).first()
 
-def get_quizzes(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(Quiz).offset(skip).limit(limit).all()
+def get_quizzes(db: Session, skip: int = 0, limit: int = 100, with_questions: bool = True):
+    query = db.query(Quiz)
+    if with_questions:
+        # selectinload fetches every quiz's questions in one IN-query instead of one lazy load per quiz
+        query = query.options(selectinload(Quiz.questions))
+    return query.offset(skip).limit(limit).all()
+
+def get_quiz_page(db: Session, after_id: str | None = None, limit: int = 100, with_questions: bool = True):
+    """
+    Keyset page of quizzes ordered by id, starting after `after_id`.
+    Returns (quizzes, last_id) where last_id is None on the final page.
+    """
+    if limit < 1:
+        raise ValueError("limit must be at least 1")
+    query = db.query(Quiz).order_by(Quiz.id)
+    if after_id:
+        query = query.filter(Quiz.id > after_id)
+    if with_questions:
+        query = query.options(selectinload(Quiz.questions))
+    quizzes = query.limit(limit + 1).all()
+    if len(quizzes) > limit:
+        quizzes = quizzes[:limit]
+        return quizzes, quizzes[-1].id
+    return quizzes, None
+
+def count_questions(db: Session, quiz_ids: List[str]) -> Dict[str, int]:
+    if not quiz_ids:
+        return {}
+    rows = (
+        db.query(Question.quiz_id, func.count(Question.id))
+        .filter(Question.quiz_id.in_(quiz_ids))
+        .group_by(Question.quiz_id)
+    )
+    return dict(rows)
+
+def encode_cursor(quiz_id: str) -> str:
+    return base64.urlsafe_b64encode(quiz_id.encode()).decode()
+
+def decode_cursor(cursor: str) -> str:
+    return base64.b64decode(cursor.encode(), altchars=b"-_", validate=True).decode()
 
 def create_quiz(db: Session, quiz: QuizCreate):
-    # Step 1: Create the main Quiz entry
-    db_quiz = Quiz(title=quiz.title, description=quiz.description)
+    # Quiz and questions go in one transaction; the questions as one multi-row INSERT
+    db_quiz = Quiz(
+        id=str(uuid.uuid4()),
+        title=quiz.title,
+        description=quiz.description,
+        time_limit_seconds=quiz.time_limit_seconds,
+    )
     db.add(db_quiz)
+    db.flush()
+    if quiz.questions:
+        db.execute(insert(Question), [
+            {"id": str(uuid.uuid4()), "quiz_id": db_quiz.id, **question_data.model_dump()}
+            for question_data in quiz.questions
+        ])
     db.commit()
-    db.refresh(db_quiz) # Refresh to get the new quiz ID
-
-    # Step 2: Loop through the incoming questions and add them to the database
-    for question_data in quiz.questions:
-        db_question = Question(
-            **question_data.model_dump(), # Unpack question_text, options, etc.
-            quiz_id=db_quiz.id # Link to the quiz we just created
-        )
-        db.add(db_question)
-    
-    db.commit() # Commit all the new questions at once
-    db.refresh(db_quiz) # Refresh again to load the questions into the quiz object
+    quiz_cache.invalidate(db_quiz.id)
+    db.refresh(db_quiz) # Refresh to load the questions into the quiz object
     return db_quiz
 
+class QuizChangeError(ValueError):
+    pass
+
+QUESTION_FIELDS = ("question_text", "options", "correct_answer")
+
+def apply_question_changes(db: Session, quiz_id: str, inserts: List[Dict[str, Any]],
+                           updates: List[Dict[str, Any]], deletes: List[str]) -> List[str]:
+    """
+    One statement batch per kind: a single DELETE ... IN, an executemany UPDATE by
+    primary key (each dict carries "id" plus only the changed columns), and a
+    multi-row INSERT. Unchanged questions are not touched and keep their ids.
+    Returns the ids generated for the inserted questions. Does not commit.
+    """
+    if deletes:
+        db.execute(delete(Question).where(Question.quiz_id == quiz_id, Question.id.in_(deletes)))
+    if updates:
+        db.execute(update(Question), updates)
+    rows = [{"id": str(uuid.uuid4()), "quiz_id": quiz_id, **row} for row in inserts]
+    if rows:
+        db.execute(insert(Question), rows)
+    return [row["id"] for row in rows]
+
+def diff_quiz(db: Session, db_quiz: Quiz, quiz_update: QuizUpdate) -> Dict[str, List[str]]:
+    """Full replacement (PUT) expressed as the minimal set of question inserts/updates/deletes."""
+    db_quiz.title = quiz_update.title
+    db_quiz.description = quiz_update.description
+    db_quiz.time_limit_seconds = quiz_update.time_limit_seconds
+    current = {
+        row.id: row for row in
+        db.query(Question.id, *(getattr(Question, field) for field in QUESTION_FIELDS)).filter(Question.quiz_id == db_quiz.id)
+    }
+    inserts, updates, kept = [], [], set()
+    for question in quiz_update.questions:
+        fields = question.model_dump(exclude={"id"})
+        if question.id is None:
+            inserts.append(fields)
+            continue
+        existing = current.get(question.id)
+        if existing is None:
+            raise QuizChangeError(f"Question {question.id} does not belong to this quiz")
+        if question.id in kept:
+            raise QuizChangeError(f"Question {question.id} appears more than once")
+        kept.add(question.id)
+        changed = {field: value for field, value in fields.items() if getattr(existing, field) != value}
+        if changed:
+            updates.append({"id": question.id, **changed})
+    deletes = [question_id for question_id in current if question_id not in kept]
+    inserted = apply_question_changes(db, db_quiz.id, inserts, updates, deletes)
+    return {"inserted": inserted, "updated": [row["id"] for row in updates], "deleted": deletes}
+
+def patch_quiz(db: Session, db_quiz: Quiz, patch: QuizPatch) -> Dict[str, List[str]]:
+    """Partial update that only reads and writes the questions named in the patch."""
+    for field in ("title", "description", "time_limit_seconds"):
+        if field in patch.model_fields_set:
+            setattr(db_quiz, field, getattr(patch, field))
+    referenced = [question.id for question in patch.questions if question.id] + patch.delete_questions
+    if len(set(referenced)) != len(referenced):
+        raise QuizChangeError("A question may be updated or deleted only once per patch")
+    if referenced:
+        found = {
+            question_id for (question_id,) in
+            db.query(Question.id).filter(Question.quiz_id == db_quiz.id, Question.id.in_(referenced))
+        }
+        missing = [question_id for question_id in referenced if question_id not in found]
+        if missing:
+            raise QuizChangeError(f"Questions do not belong to this quiz: {', '.join(missing)}")
+    inserts, updates = [], []
+    for question in patch.questions:
+        fields = question.model_dump(include=set(QUESTION_FIELDS) & question.model_fields_set)
+        if question.id is None:
+            if any(fields.get(field) is None for field in QUESTION_FIELDS):
+                raise QuizChangeError("New questions need question_text, options and correct_answer")
+            inserts.append(fields)
+        elif fields:
+            if any(value is None for value in fields.values()):
+                raise QuizChangeError(f"Question {question.id}: fields cannot be set to null")
+            updates.append({"id": question.id, **fields})
+    inserted = apply_question_changes(db, db_quiz.id, inserts, updates, patch.delete_questions)
+    return {"inserted": inserted, "updated": [row["id"] for row in updates], "deleted": list(patch.delete_questions)}
+
+def grade_submission(answer_key: Dict[str, str], answers: Dict[str, str]) -> Dict[str, bool]:
+    """question_id -> answered correctly, for every question of the quiz."""
+    return {question_id: answers.get(question_id) == correct for question_id, correct in answer_key.items()}
+
+def score_results(results: Dict[str, bool]) -> float:
+    """Percentage of the quiz's questions answered correctly (same scale the frontend shows)."""
+    if not results:
+        return 0.0
+    return sum(results.values()) / len(results) * 100
+
 def get_user(db: Session, username: str):
     return db.query(User).filter(User.username == username).first()
 
+# Async counterparts for async def endpoints. No lazy loading on an AsyncSession,
+# so relationships the caller needs are loaded up front.
+async def get_user_async(db: AsyncSession, username: str):
+    return await db.scalar(select(User).where(User.username == username))
+
+async def get_quiz_async(db: AsyncSession, quiz_id: str):
+    return await db.scalar(select(Quiz).where(Quiz.id == quiz_id).options(selectinload(Quiz.questions)))
+
+async def get_answer_key_async(db: AsyncSession, quiz_id: str) -> Dict[str, str] | None:
+    """question_id -> correct_answer in one round trip, or None if the quiz does not exist."""
+    rows = (await db.execute(
+        select(Question.id, Question.correct_answer)
+        .select_from(Quiz)
+        .outerjoin(Quiz.questions)
+        .where(Quiz.id == quiz_id)
+    )).all()
+    if not rows:
+        return None
+    return {question_id: correct for question_id, correct in rows if question_id is not None}
+
 def create_user(db: Session, user: UserCreate):
     hashed_password = get_password_hash(user.password)
     db_user = User(username=user.username, hashed_password=hashed_password)
     db.add(db_user)
     db.commit()
+    principal_cache.invalidate(db_user.username)
     db.refresh(db_user)
     return db_user
 
-# --- 7. FastAPI Application & Endpoints ---
+# --- 7. Quiz Cache ---
+# Serialized QuizSchema JSON per quiz, so hot reads during a live session skip the
+# database and the ORM entirely. Entries are tagged with a per-quiz version that
+# writers bump after committing; a reader that raced a write can't store stale bytes.
+QUIZ_CACHE_MAX_ENTRIES = int(os.getenv("QUIZ_CACHE_MAX_ENTRIES", "1024"))
+QUIZ_CACHE_TTL = float(os.getenv("QUIZ_CACHE_TTL", "60.0"))
+
+def quiz_etag(body: bytes) -> str:
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+# Quiz id -> (json_bytes, etag), versioned per quiz id
+quiz_cache = VersionedTTLCache(max_entries=QUIZ_CACHE_MAX_ENTRIES, ttl=QUIZ_CACHE_TTL)
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+# --- 8. Analytics HTTP Client ---
+# One pooled, keep-alive client for the whole app lifetime instead of a new
+# connection per request. Opened on startup, closed on shutdown.
+ANALYTICS_MAX_CONNECTIONS = int(os.getenv("ANALYTICS_MAX_CONNECTIONS", "100"))
+ANALYTICS_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("ANALYTICS_MAX_KEEPALIVE_CONNECTIONS", "20"))
+ANALYTICS_KEEPALIVE_EXPIRY = float(os.getenv("ANALYTICS_KEEPALIVE_EXPIRY", "30.0"))
+ANALYTICS_CONNECT_TIMEOUT = float(os.getenv("ANALYTICS_CONNECT_TIMEOUT", "2.0"))
+ANALYTICS_TIMEOUT = float(os.getenv("ANALYTICS_TIMEOUT", "5.0"))
+
+analytics_client: httpx.AsyncClient | None = None
+
+def _percentile(ordered: List[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+class LatencyStats:
+    """
+    Rolling latency samples (seconds) per call label, with error counts.
+    Not thread-safe: record and snapshot must both run on the event loop.
+    """
+
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self._samples: Dict[str, deque] = {}
+        self._counts: Dict[str, int] = {}
+        self._errors: Dict[str, int] = {}
+
+    def record(self, label: str, seconds: float, error: bool = False):
+        self._samples.setdefault(label, deque(maxlen=self.window)).append(seconds)
+        self._counts[label] = self._counts.get(label, 0) + 1
+        if error:
+            self._errors[label] = self._errors.get(label, 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        result = {}
+        for label, samples in self._samples.items():
+            ordered = sorted(samples)
+            result[label] = {
+                "count": self._counts[label],
+                "errors": self._errors.get(label, 0),
+                "p50_ms": _percentile(ordered, 0.50) * 1000,
+                "p95_ms": _percentile(ordered, 0.95) * 1000,
+                "p99_ms": _percentile(ordered, 0.99) * 1000,
+                "max_ms": ordered[-1] * 1000,
+            }
+        return result
+
+analytics_latency = LatencyStats()
+
+def create_analytics_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        base_url=ANALYTICS_BASE_URL,
+        limits=httpx.Limits(
+            max_connections=ANALYTICS_MAX_CONNECTIONS,
+            max_keepalive_connections=ANALYTICS_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=ANALYTICS_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(ANALYTICS_TIMEOUT, connect=ANALYTICS_CONNECT_TIMEOUT),
+    )
+
+async def analytics_request(method: str, path: str, label: str | None = None, **kwargs) -> httpx.Response:
+    """
+    Send a request to the analytics service over the shared client and record its latency.
+    `label` groups templated paths (e.g. per-user URLs) under one metric.
+    """
+    label = f"{method} {label or path}"
+    start = time.perf_counter()
+    try:
+        response = await analytics_client.request(method, path, **kwargs)
+    except httpx.RequestError:
+        analytics_latency.record(label, time.perf_counter() - start, error=True)
+        raise
+    analytics_latency.record(label, time.perf_counter() - start, error=response.is_error)
+    return response
+
+# --- 9. Analytics Outbox ---
+# Submissions are written to the analytics_outbox table in the same database as
+# everything else, and a background task delivers them in batches. Delivery is
+# at-least-once; the analytics service drops redelivered ids. Events the analytics
+# service rejects (4xx) or that run out of attempts move to analytics_outbox_dead_letter.
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "200"))
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "1.0"))
+OUTBOX_BACKOFF_BASE = float(os.getenv("OUTBOX_BACKOFF_BASE", "0.5"))
+OUTBOX_BACKOFF_MAX = float(os.getenv("OUTBOX_BACKOFF_MAX", "60.0"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "20"))
+
+async def enqueue_outbox_event(db: AsyncSession, event_type: str, payload: Dict[str, Any]) -> OutboxEvent:
+    db_event = OutboxEvent(event_type=event_type, payload=payload)
+    db.add(db_event)
+    await db.commit()
+    return db_event
+
+def fetch_due_outbox_events(limit: int) -> List[Dict[str, Any]]:
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(OutboxEvent)
+            .filter(OutboxEvent.next_attempt_at <= time.time())
+            .order_by(OutboxEvent.created_at)
+            .limit(limit)
+            .all()
+        )
+        return [{"id": row.id, "event_type": row.event_type, "payload": row.payload} for row in rows]
+    finally:
+        db.close()
+
+def delete_outbox_events(ids: List[str]):
+    db = SessionLocal()
+    try:
+        db.query(OutboxEvent).filter(OutboxEvent.id.in_(ids)).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+def move_to_dead_letter(db: Session, row: OutboxEvent):
+    print(f"Dead-lettering outbox event {row.id} after {row.attempts} attempts: {row.last_error}")
+    db.add(OutboxDeadLetter(
+        id=row.id, event_type=row.event_type, payload=row.payload,
+        created_at=row.created_at, attempts=row.attempts, last_error=row.last_error,
+    ))
+    db.delete(row)
+
+def dead_letter_outbox_events(errors: Dict[str, str]):
+    """Move permanently rejected events (id -> error) out of the outbox."""
+    db = SessionLocal()
+    try:
+        for row in db.query(OutboxEvent).filter(OutboxEvent.id.in_(list(errors))):
+            row.attempts += 1
+            row.last_error = errors[row.id][:500]
+            move_to_dead_letter(db, row)
+        db.commit()
+    finally:
+        db.close()
+
+def reschedule_outbox_events(errors: Dict[str, str]):
+    """Back off events that failed transiently (id -> error); dead-letter those out of attempts."""
+    db = SessionLocal()
+    try:
+        now = time.time()
+        for row in db.query(OutboxEvent).filter(OutboxEvent.id.in_(list(errors))):
+            row.attempts += 1
+            row.last_error = errors[row.id][:500]
+            if row.attempts >= OUTBOX_MAX_ATTEMPTS:
+                move_to_dead_letter(db, row)
+                continue
+            delay = min(OUTBOX_BACKOFF_MAX, OUTBOX_BACKOFF_BASE * (2 ** (row.attempts - 1)))
+            # Full jitter so a recovering analytics service isn't hit by every row at once
+            row.next_attempt_at = now + random.uniform(delay / 2, delay)
+        db.commit()
+    finally:
+        db.close()
+
+def is_permanent_delivery_error(response: httpx.Response) -> bool:
+    """4xx means the analytics service rejected the events themselves; retrying won't help."""
+    return response.is_client_error and response.status_code not in (408, 429)
+
+class OutboxDispatcher:
+    """
+    Background task that drains analytics_outbox into POST /events/batch?durable=true.
+    A batch the analytics service rejects is re-sent one event at a time, so only the
+    offending events are dead-lettered and the rest are delivered.
+    """
+
+    def __init__(self, batch_size: int = 200, poll_interval: float = 1.0):
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self._wakeup: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def wake(self):
+        if self._wakeup:
+            self._wakeup.set()
+
+    async def dispatch_once(self) -> int:
+        """Deliver one batch of due events. Returns how many were delivered."""
+        events = await asyncio.to_thread(fetch_due_outbox_events, self.batch_size)
+        if not events:
+            return 0
+        ids = [event["id"] for event in events]
+        try:
+            response = await self._send(events)
+        except httpx.RequestError as e:
+            print(f"Could not deliver {len(ids)} outbox events to analytics service: {e}")
+            await asyncio.to_thread(reschedule_outbox_events, {id: str(e) for id in ids})
+            return 0
+        if response.is_success:
+            await asyncio.to_thread(delete_outbox_events, ids)
+            return len(ids)
+        error = f"HTTP {response.status_code}: {response.text}"
+        if not is_permanent_delivery_error(response):
+            print(f"Could not deliver {len(ids)} outbox events to analytics service: {error}")
+            await asyncio.to_thread(reschedule_outbox_events, {id: error for id in ids})
+            return 0
+        if len(events) == 1:
+            await asyncio.to_thread(dead_letter_outbox_events, {ids[0]: error})
+            return 0
+        return await self._dispatch_each(events)
+
+    async def _send(self, events: List[Dict[str, Any]]) -> httpx.Response:
+        return await analytics_request(
+            "POST", "/events/batch", params={"durable": "true"}, json={"events": events}
+        )
+
+    async def _dispatch_each(self, events: List[Dict[str, Any]]) -> int:
+        """Deliver a rejected batch one event at a time. Returns how many were delivered."""
+        delivered: List[str] = []
+        rejected: Dict[str, str] = {}
+        retry: Dict[str, str] = {}
+        for index, event in enumerate(events):
+            try:
+                response = await self._send([event])
+            except httpx.RequestError as e:
+                # The service went away; don't wait out a timeout for every remaining event
+                retry.update({later["id"]: str(e) for later in events[index:]})
+                break
+            if response.is_success:
+                delivered.append(event["id"])
+            elif is_permanent_delivery_error(response):
+                rejected[event["id"]] = f"HTTP {response.status_code}: {response.text}"
+            else:
+                retry[event["id"]] = f"HTTP {response.status_code}: {response.text}"
+        if delivered:
+            await asyncio.to_thread(delete_outbox_events, delivered)
+        if rejected:
+            await asyncio.to_thread(dead_letter_outbox_events, rejected)
+        if retry:
+            await asyncio.to_thread(reschedule_outbox_events, retry)
+        return len(delivered)
+
+    async def _run(self):
+        while True:
+            try:
+                delivered = await self.dispatch_once()
+            except Exception as e:
+                print(f"Outbox dispatcher error: {e}")
+                delivered = 0
+            if delivered >= self.batch_size:
+                continue  # more may be waiting; don't sleep
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+outbox_dispatcher = OutboxDispatcher(batch_size=OUTBOX_BATCH_SIZE, poll_interval=OUTBOX_POLL_INTERVAL)
+
+# --- 10. Bulk Import / Export ---
+# NDJSON, one quiz per line in the QuizSchema shape (ids optional on import), so an
+# export can be fed straight back into an import. Both directions hold at most one
+# batch/page in memory regardless of the size of the question bank.
+IMPORT_BATCH_QUESTIONS = int(os.getenv("IMPORT_BATCH_QUESTIONS", "5000"))
+IMPORT_MAX_LINE_BYTES = int(os.getenv("IMPORT_MAX_LINE_BYTES", str(16 * 1024 * 1024)))
+IMPORT_MAX_REPORTED_ERRORS = int(os.getenv("IMPORT_MAX_REPORTED_ERRORS", "100"))
+EXPORT_PAGE_SIZE = int(os.getenv("EXPORT_PAGE_SIZE", "500"))
+
+class ImportLineTooLong(Exception):
+    pass
+
+async def iter_ndjson_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Split a byte stream into non-empty lines without buffering more than one line."""
+    buffer = b""
+    async for chunk in chunks:
+        if b"\n" in chunk:
+            *lines, rest = (buffer + chunk).split(b"\n")
+            buffer = rest
+            for line in lines:
+                if line.strip():
+                    yield line
+        else:
+            buffer += chunk
+        if len(buffer) > IMPORT_MAX_LINE_BYTES:
+            raise ImportLineTooLong(f"Line longer than {IMPORT_MAX_LINE_BYTES} bytes")
+    if buffer.strip():
+        yield buffer
+
+async def iter_upload_chunks(upload, chunk_size: int = 64 * 1024) -> AsyncIterator[bytes]:
+    while chunk := await upload.read(chunk_size):
+        yield chunk
+
+class QuizImporter:
+    """
+    Validated quizzes are collected until IMPORT_BATCH_QUESTIONS questions are pending,
+    then written with two multi-row INSERTs (quizzes, questions) in one transaction.
+    Quizzes whose ids already exist are reported as errors, or counted as skipped
+    with on_conflict="skip".
+    """
+    def __init__(self, on_conflict: str = "error"):
+        self.on_conflict = on_conflict
+        self.result = ImportResult()
+        self._pending: List[tuple] = []  # (line number, QuizImport)
+        self._pending_questions = 0
+
+    def error(self, line: int, message: str):
+        self.result.error_count += 1
+        if len(self.result.errors) < IMPORT_MAX_REPORTED_ERRORS:
+            self.result.errors.append({"line": line, "error": message})
+
+    def add(self, line: int, quiz: QuizImport) -> bool:
+        """Queue a quiz; returns True when a batch is ready to flush()."""
+        self._pending.append((line, quiz))
+        self._pending_questions += len(quiz.questions) + 1
+        return self._pending_questions >= IMPORT_BATCH_QUESTIONS
+
+    def flush(self):
+        batch, self._pending, self._pending_questions = self._pending, [], 0
+        if not batch:
+            return
+        db = SessionLocal()
+        try:
+            quiz_ids = [quiz.id for _, quiz in batch if quiz.id]
+            question_ids = [question.id for _, quiz in batch for question in quiz.questions if question.id]
+            existing_quizzes = {row[0] for row in db.query(Quiz.id).filter(Quiz.id.in_(quiz_ids))} if quiz_ids else set()
+            existing_questions = (
+                {row[0] for row in db.query(Question.id).filter(Question.id.in_(question_ids))} if question_ids else set()
+            )
+            quiz_rows, question_rows = [], []
+            seen_quizzes, seen_questions = set(), set()
+            for line, quiz in batch:
+                ids = [question.id for question in quiz.questions if question.id]
+                clash = (
+                    quiz.id in existing_quizzes
+                    or quiz.id in seen_quizzes
+                    or len(set(ids)) != len(ids)
+                    or any(question_id in existing_questions or question_id in seen_questions for question_id in ids)
+                )
+                if clash:
+                    if self.on_conflict == "skip":
+                        self.result.skipped += 1
+                    else:
+                        self.error(line, "quiz or question id already exists")
+                    continue
+                quiz_id = quiz.id or str(uuid.uuid4())
+                seen_quizzes.add(quiz_id)
+                seen_questions.update(ids)
+                quiz_rows.append({
+                    "id": quiz_id,
+                    "title": quiz.title,
+                    "description": quiz.description,
+                    "time_limit_seconds": quiz.time_limit_seconds,
+                })
+                question_rows.extend(
+                    {
+                        "id": question.id or str(uuid.uuid4()),
+                        "quiz_id": quiz_id,
+                        "question_text": question.question_text,
+                        "options": question.options,
+                        "correct_answer": question.correct_answer,
+                    }
+                    for question in quiz.questions
+                )
+            if quiz_rows:
+                db.execute(insert(Quiz), quiz_rows)
+            if question_rows:
+                db.execute(insert(Question), question_rows)
+            db.commit()
+            self.result.imported_quizzes += len(quiz_rows)
+            self.result.imported_questions += len(question_rows)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+async def import_quizzes(lines: AsyncIterator[bytes], on_conflict: str) -> ImportResult:
+    importer = QuizImporter(on_conflict=on_conflict)
+    line_number = 0
+    try:
+        async for line in lines:
+            line_number += 1
+            try:
+                quiz = QuizImport.model_validate_json(line)
+            except ValidationError as e:
+                importer.error(line_number, "; ".join(
+                    f"{'.'.join(map(str, error['loc'])) or 'line'}: {error['msg']}" for error in e.errors()
+                ))
+                continue
+            if importer.add(line_number, quiz):
+                await asyncio.to_thread(importer.flush)
+    except ImportLineTooLong as e:
+        importer.error(line_number + 1, str(e))
+    await asyncio.to_thread(importer.flush)
+    return importer.result
+
+def export_quizzes() -> Iterator[bytes]:
+    """One QuizSchema JSON document per line, paged by id with a read-only session."""
+    db = ReadSessionLocal()
+    try:
+        after_id = None
+        while True:
+            quizzes, after_id = get_quiz_page(db, after_id=after_id, limit=EXPORT_PAGE_SIZE)
+            if quizzes:
+                yield b"".join(QuizSchema.model_validate(quiz).model_dump_json().encode() + b"\n" for quiz in quizzes)
+            db.expunge_all()  # keep the identity map from growing with every page
+            if after_id is None:
+                break
+    finally:
+        db.close()
+
+# --- 11. FastAPI Application & Endpoints ---
 app = FastAPI(title="API Service")
 
 # vvv ADD THIS MIDDLEWARE CONFIG vvv
@@ -172,13 +943,33 @@ app.add_middleware(
 )
 # ^^^ ADD THIS MIDDLEWARE CONFIG ^^^
 
+@app.exception_handler(HashingOverloaded)
+async def hashing_overloaded_handler(request: Request, exc: HashingOverloaded):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Too many logins in progress, please retry"},
+        headers={"Retry-After": "1"},
+    )
+
 def get_db():
     db = SessionLocal()
     try: yield db
     finally: db.close()
 
+def get_read_db():
+    db = ReadSessionLocal()
+    try: yield db
+    finally: db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
 # Dependency to get current user
-async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)], db: Session = Depends(get_db)):
+async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]) -> Principal:
+    principal = principal_cache.get(token)
+    if principal is not None:
+        return principal
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -192,14 +983,56 @@ async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)], db: Se
         token_data = TokenData(username=username)
     except JWTError:
         raise credentials_exception
-    user = get_user(db, username=token_data.username)
-    if user is None:
-        raise credentials_exception
-    return user
+    version = principal_cache.version(token_data.username)
+    async with AsyncSessionLocal() as db:
+        user = await get_user_async(db, username=token_data.username)
+        if user is None:
+            raise credentials_exception
+        principal = Principal.model_validate(user)
+    exp = payload.get("exp")
+    principal_cache.put(token, principal.username, version, principal, ttl=None if exp is None else exp - time.time())
+    return principal
 
 @app.on_event("startup")
 def on_startup():
     Base.metadata.create_all(bind=engine)
+    # create_all skips new indexes on tables that already exist
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+    ReadSessionLocal.configure(bind=create_read_engine(DATABASE_URL, engine))
+
+@app.on_event("startup")
+def start_password_hasher():
+    password_hasher.start()
+
+@app.on_event("shutdown")
+def stop_password_hasher():
+    password_hasher.stop()
+
+@app.on_event("startup")
+async def open_analytics_client():
+    global analytics_client
+    analytics_client = create_analytics_client()
+
+@app.on_event("startup")
+async def start_outbox_dispatcher():
+    outbox_dispatcher.start()
+
+@app.on_event("shutdown")
+async def stop_outbox_dispatcher():
+    await outbox_dispatcher.stop()
+
+@app.on_event("shutdown")
+async def dispose_async_engine():
+    await async_engine.dispose()
+
+@app.on_event("shutdown")
+async def close_analytics_client():
+    global analytics_client
+    if analytics_client:
+        await analytics_client.aclose()
+        analytics_client = None
 
 # User and Auth Endpoints
 @app.post("/users/register", response_model=UserSchema)
@@ -217,10 +1050,10 @@ def register_user(user: UserCreate, db: Session = Depends(get_db)):
 
 @app.post("/users/login", response_model=Token)
 async def login_for_access_token(
-    form_data: Annotated[OAuth2PasswordRequestForm, Depends()], db: Session = Depends(get_db)
+    form_data: Annotated[OAuth2PasswordRequestForm, Depends()], db: AsyncSession = Depends(get_async_db)
 ):
-    user = get_user(db, username=form_data.username)
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    user = await authenticate_user(db, form_data.username, form_data.password)
+    if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -234,35 +1067,15 @@ async def login_for_access_token(
     return {"access_token": access_token, "token_type": "bearer"}
 
 @app.get("/users/me/profile")
-async def read_user_profile(
-    current_user: Annotated[UserSchema, Depends(get_current_user)],
-    db: Session = Depends(get_db)
-):
+async def read_user_profile(current_user: Annotated[Principal, Depends(get_current_user)]):
     try:
-        # Make a network request to the analytics service
-        async with httpx.AsyncClient() as client:
-            response = await client.get(ANALYTICS_SERVICE_URL)
-            response.raise_for_status()
-            all_events = response.json()
-
-        # Filter events for the current user
-        user_events = [
-            event for event in all_events 
-            if event["event_type"] == "quiz_completed" and event["payload"]["userId"] == current_user.username
-        ]
-
-        if not user_events:
-            return {
-                "username": current_user.username,
-                "quizzes_taken": 0,
-                "average_score": 0,
-                "achievements": []
-            }
+        # Pre-aggregated per-user stats, maintained by the analytics service on ingest
+        stats_path = f"/users/{quote(current_user.username, safe='')}/stats"
+        response = await analytics_request("GET", stats_path, label="/users/{user_id}/stats")
+        response.raise_for_status()
+        stats = response.json()
 
-        # Calculate stats
-        quizzes_taken = len(user_events)
-        total_score = sum(event["payload"]["score"] for event in user_events)
-        average_score = total_score / quizzes_taken
+        quizzes_taken = stats["quizzes_taken"]
 
         # Placeholder for achievements logic
         achievements = ["First Quiz!"] if quizzes_taken > 0 else []
@@ -270,7 +1083,7 @@ async def read_user_profile(
         return {
             "username": current_user.username,
             "quizzes_taken": quizzes_taken,
-            "average_score": average_score,
+            "average_score": stats["average_score"],
             "achievements": achievements
         }
 
@@ -284,49 +1097,154 @@ async def read_user_profile(
 @app.post("/quizzes", response_model=QuizSchema, status_code=201)
 def create_new_quiz(
     quiz: QuizCreate,
-    current_user: Annotated[UserSchema, Depends(get_current_user)],
+    current_user: Annotated[Principal, Depends(get_current_user)],
     db: Session = Depends(get_db)
 ):
     print(f"Quiz created by: {current_user.username}")
     return create_quiz(db=db, quiz=quiz)
 
-@app.get("/quizzes", response_model=List[QuizSchema])
-def read_quizzes(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return get_quizzes(db, skip=skip, limit=limit)
+@app.get("/quizzes", response_model=None)
+def read_quizzes(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=QUIZ_MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    summary: bool = False,
+    db: Session = Depends(get_read_db),
+) -> List[QuizSchema] | List[QuizSummarySchema] | QuizPage:
+    """
+    Without `cursor`: the original offset listing (a plain list).
+    With `cursor` (empty for the first page): a keyset page {items, next_cursor}.
+    `summary=true` omits questions and returns question_count instead.
+    """
+    if cursor is None:
+        quizzes = get_quizzes(db, skip=skip, limit=limit, with_questions=not summary)
+        next_id = None
+    else:
+        try:
+            after_id = decode_cursor(cursor) if cursor else None
+        except (binascii.Error, UnicodeDecodeError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        quizzes, next_id = get_quiz_page(db, after_id=after_id, limit=limit, with_questions=not summary)
+
+    if summary:
+        counts = count_questions(db, [quiz.id for quiz in quizzes])
+        items = [
+            QuizSummarySchema(
+                id=quiz.id,
+                title=quiz.title,
+                description=quiz.description,
+                time_limit_seconds=quiz.time_limit_seconds,
+                question_count=counts.get(quiz.id, 0),
+            )
+            for quiz in quizzes
+        ]
+    else:
+        items = [QuizSchema.model_validate(quiz) for quiz in quizzes]
+
+    if cursor is None:
+        return items
+    return QuizPage(items=items, next_cursor=encode_cursor(next_id) if next_id else None)
+
+@app.post("/quizzes/import", response_model=ImportResult)
+async def import_quiz_bank(
+    request: Request,
+    current_user: Annotated[Principal, Depends(get_current_user)],
+    on_conflict: Literal["error", "skip"] = "error",
+):
+    """
+    Bulk import from NDJSON: either the raw request body (application/x-ndjson) or a
+    multipart/form-data upload in the `file` field. Lines are validated as they stream
+    in; invalid lines are reported and skipped, valid ones are inserted in batches.
+    """
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get("file")
+        if upload is None or isinstance(upload, str):
+            raise HTTPException(status_code=400, detail="Expected a file upload in the 'file' field")
+        try:
+            result = await import_quizzes(iter_ndjson_lines(iter_upload_chunks(upload)), on_conflict)
+        finally:
+            await form.close()
+    else:
+        result = await import_quizzes(iter_ndjson_lines(request.stream()), on_conflict)
+    print(f"Quiz import by {current_user.username}: {result.imported_quizzes} quizzes, "
+          f"{result.imported_questions} questions, {result.error_count} errors")
+    return result
+
+@app.get("/quizzes/export")
+def export_quiz_bank(current_user: Annotated[Principal, Depends(get_current_user)]):
+    """Stream every quiz with its questions as NDJSON (the format /quizzes/import accepts)."""
+    return StreamingResponse(export_quizzes(), media_type="application/x-ndjson")
 
 @app.get("/quizzes/{quiz_id}", response_model=QuizSchema)
-def read_quiz(quiz_id: str, db: Session = Depends(get_db)):
-    db_quiz = get_quiz(db, quiz_id=quiz_id)
-    if db_quiz is None:
-        raise HTTPException(status_code=404, detail="Quiz not found")
-    return db_quiz
+async def read_quiz(
+    quiz_id: str,
+    if_none_match: Annotated[str | None, Header()] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    cached = quiz_cache.get(quiz_id)
+    if cached is None:
+        version = quiz_cache.version(quiz_id)
+        db_quiz = await get_quiz_async(db, quiz_id=quiz_id)
+        if db_quiz is None:
+            raise HTTPException(status_code=404, detail="Quiz not found")
+        body = QuizSchema.model_validate(db_quiz).model_dump_json().encode()
+        cached = (body, quiz_etag(body))
+        quiz_cache.put(quiz_id, quiz_id, version, cached)
+    body, etag = cached
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 @app.post("/quizzes/{quiz_id}/submit")
-async def submit_quiz(quiz_id: str, submission: SubmissionSchema, db: Session = Depends(get_db)):
-    # The scoring logic is now on the frontend. We just trust the score sent.
-    # In a real-world app, you might want to re-validate the score here for security.
+async def submit_quiz(quiz_id: str, submission: SubmissionSchema, db: AsyncSession = Depends(get_async_db)):
+    # Score server-side from the stored answer key; a client-sent score is ignored.
+    answer_key = await get_answer_key_async(db, quiz_id=quiz_id)
+    if answer_key is None:
+        raise HTTPException(status_code=404, detail="Quiz not found")
+    # Only answers to this quiz's questions are kept; other keys are client junk
+    answers = {question_id: answer for question_id, answer in submission.answers.items() if question_id in answer_key}
+    results = grade_submission(answer_key, answers)
+    score = score_results(results)
 
     event_data = {
         "event_type": "quiz_completed",
         "payload": {
             "quizId": str(quiz_id),
             "userId": submission.userId,
-            "score": submission.score, # <--- USE THE SCORE FROM THE SUBMISSION
-            "answers": submission.answers
+            "score": score,
+            "answers": answers,
+            "results": results  # per-question correctness, for item analysis
         }
     }
-    try:
-        async with httpx.AsyncClient() as client:
-            await client.post(ANALYTICS_SERVICE_URL, json=event_data)
-    except httpx.RequestError as e:
-        print(f"Could not send event to analytics service: {e}")
+    # Durably queued here; the outbox dispatcher delivers it in the background
+    await enqueue_outbox_event(db, event_data["event_type"], event_data["payload"])
+    outbox_dispatcher.wake()
 
     return {
         "message": "Submission received successfully!",
         "quiz_id": quiz_id,
-        "score": submission.score
+        "score": score
     }
 
+@app.get("/metrics/analytics")
+async def read_analytics_metrics():
+    return analytics_latency.snapshot()
+
+@app.get("/metrics/quiz-cache")
+def read_quiz_cache_metrics():
+    return quiz_cache.stats()
+
+@app.get("/metrics/principal-cache")
+def read_principal_cache_metrics():
+    return principal_cache.stats()
+
+@app.get("/metrics/password-hashing")
+def read_password_hashing_metrics():
+    return password_hasher.stats()
+
 @app.post("/create-admin-user-once")
 def create_admin_user(db: Session = Depends(get_db)):
     admin_username = "admin"
@@ -345,6 +1263,7 @@ def create_admin_user(db: Session = Depends(get_db)):
     )
     db.add(db_user)
     db.commit()
+    principal_cache.invalidate(admin_username)
     db.refresh(db_user)
     return {"message": f"Admin user '{admin_username}' created successfully."}
 
@@ -355,35 +1274,56 @@ def create_admin_user(db: Session = Depends(get_db)):
 @app.put("/quizzes/{quiz_id}", response_model=QuizSchema)
 def update_quiz(
     quiz_id: str,
-    quiz_update: QuizCreate, # Reuse the create schema for updates
-    current_user: Annotated[UserSchema, Depends(get_current_user)],
+    quiz_update: QuizUpdate,
+    current_user: Annotated[Principal, Depends(get_current_user)],
     db: Session = Depends(get_db)
 ):
+    """
+    Replace the quiz. Questions sent with their id are updated in place (only if they
+    changed), questions without an id are added and questions left out are deleted.
+    """
     db_quiz = get_quiz(db, quiz_id=quiz_id)
     if not db_quiz:
         raise HTTPException(status_code=404, detail="Quiz not found")
-        
-    # Update quiz title and description
-    db_quiz.title = quiz_update.title
-    db_quiz.description = quiz_update.description
-    
-    # Delete old questions
-    for question in db_quiz.questions:
-        db.delete(question)
-        
-    # Add new questions
-    for question_data in quiz_update.questions:
-        db_question = Question(**question_data.model_dump(), quiz_id=db_quiz.id)
-        db.add(db_question)
-        
+    try:
+        diff_quiz(db, db_quiz, quiz_update)
+    except QuizChangeError as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
     db.commit()
+    quiz_cache.invalidate(quiz_id)
     db.refresh(db_quiz)
     return db_quiz
+
+@app.patch("/quizzes/{quiz_id}", response_model=QuizChanges)
+def patch_quiz_endpoint(
+    quiz_id: str,
+    patch: QuizPatch,
+    current_user: Annotated[Principal, Depends(get_current_user)],
+    db: Session = Depends(get_db)
+):
+    """
+    Partial update: quiz fields that are present, `questions` entries with an id are
+    partially updated, entries without an id are inserted, `delete_questions` are removed.
+    Cost is proportional to the number of questions named in the patch.
+    """
+    db_quiz = get_quiz(db, quiz_id=quiz_id)
+    if not db_quiz:
+        raise HTTPException(status_code=404, detail="Quiz not found")
+    try:
+        changes = patch_quiz(db, db_quiz, patch)
+    except QuizChangeError as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    db.commit()
+    quiz_cache.invalidate(quiz_id)
+    return QuizChanges(id=quiz_id, **changes)
+
 @app.post("/quizzes/{quiz_id}/questions", response_model=QuestionSchema)
 def create_question_for_quiz(
     quiz_id: str,
     question: QuestionCreate,
-    current_user: Annotated[UserSchema, Depends(get_current_user)],
+    current_user: Annotated[Principal, Depends(get_current_user)],
     db: Session = Depends(get_db)
 ):
     db_quiz = get_quiz(db, quiz_id=quiz_id)
@@ -393,5 +1333,6 @@ def create_question_for_quiz(
     db_question = Question(**question.model_dump(), quiz_id=quiz_id)
     db.add(db_question)
     db.commit()
+    quiz_cache.invalidate(quiz_id)
     db.refresh(db_question)
     return db_question
\ No newline at end of file
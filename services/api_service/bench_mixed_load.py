@@ -0,0 +1,162 @@
+"""
+bench_mixed_load.py
+-------------------
+Load test: starts the API under uvicorn (own process, throwaway SQLite file) and drives
+it with concurrent clients sending a live-session style mix of requests:
+
+    GET  /quizzes/{id}            quiz reads (mostly quiz cache hits)
+    POST /quizzes/{id}/submit     submissions (quiz load + outbox insert)
+    GET  /quizzes?summary=true    keyset listing
+    PATCH /quizzes/{id}           authenticated edits (invalidate the quiz cache)
+    POST /users/login             logins (Argon2)
+
+Reports overall throughput and per-request latency percentiles.
+--app-dir runs the same traffic against another checkout of api_service, for before/after numbers.
+
+    python bench_mixed_load.py --concurrency 64 --seconds 15
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+MIX = {"read": 60, "submit": 25, "list": 8, "patch": 6, "login": 1}
+PASSWORD = "load-test-password"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_until_up(client: httpx.AsyncClient, server: subprocess.Popen):
+    for _ in range(200):
+        if server.poll() is not None:
+            raise RuntimeError("API server exited during startup")
+        try:
+            await client.get("/metrics/quiz-cache")
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError("API server did not start")
+
+
+async def prepare(client: httpx.AsyncClient, quizzes: int, questions: int) -> tuple[dict, list]:
+    (await client.post("/users/register", json={"username": "loadtest", "password": PASSWORD})).raise_for_status()
+    response = await client.post("/users/login", data={"username": "loadtest", "password": PASSWORD})
+    response.raise_for_status()
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    quiz_answers = []
+    for n in range(quizzes):
+        body = {
+            "title": f"Load test quiz {n}",
+            "questions": [
+                {"question_text": f"Question {i}", "options": {"a": "1", "b": "2", "c": "3"}, "correct_answer": "a"}
+                for i in range(questions)
+            ],
+        }
+        response = await client.post("/quizzes", headers=headers, json=body)
+        response.raise_for_status()
+        quiz = response.json()
+        quiz_answers.append((quiz["id"], {q["id"]: random.choice("abc") for q in quiz["questions"]}))
+    return headers, quiz_answers
+
+
+async def drive(client: httpx.AsyncClient, headers: dict, quiz_answers: list, concurrency: int, seconds: float) -> dict:
+    latencies = {kind: [] for kind in MIX}
+    errors = {kind: 0 for kind in MIX}
+    kinds, weights = list(MIX), list(MIX.values())
+    deadline = time.perf_counter() + seconds
+
+    async def one(kind: str):
+        quiz_id, answers = random.choice(quiz_answers)
+        if kind == "read":
+            return await client.get(f"/quizzes/{quiz_id}")
+        if kind == "submit":
+            body = {"userId": f"user{random.randrange(10000)}", "answers": answers}
+            return await client.post(f"/quizzes/{quiz_id}/submit", json=body)
+        if kind == "list":
+            return await client.get("/quizzes", params={"summary": "true", "cursor": "", "limit": 20})
+        if kind == "patch":
+            return await client.patch(f"/quizzes/{quiz_id}", headers=headers, json={"description": str(time.time())})
+        return await client.post("/users/login", data={"username": "loadtest", "password": PASSWORD})
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            kind = random.choices(kinds, weights)[0]
+            start = time.perf_counter()
+            try:
+                response = await one(kind)
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                latencies[kind].append(time.perf_counter() - start)
+            else:
+                errors[kind] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return {"elapsed": time.perf_counter() - start, "latencies": latencies, "errors": errors}
+
+
+def percentile(values, q: int) -> float:
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method="inclusive")[q - 1]
+
+
+def report(results: dict):
+    elapsed = results["elapsed"]
+    total = sum(len(values) for values in results["latencies"].values())
+    print(f"total    {total / elapsed:8.1f} req/s  errors {sum(results['errors'].values())}")
+    for kind, values in results["latencies"].items():
+        print(
+            f"{kind:<8} {len(values) / elapsed:8.1f} req/s  p50 {percentile(values, 50) * 1000:7.1f} ms  "
+            f"p99 {percentile(values, 99) * 1000:7.1f} ms  errors {results['errors'][kind]}"
+        )
+
+
+async def main(app_dir: str, concurrency: int, seconds: float, quizzes: int, questions: int):
+    workdir = tempfile.mkdtemp(prefix="bench_mixed_load_")
+    port = free_port()
+    env = {**os.environ, "PYTHONUNBUFFERED": "1"}
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api_app:app", "--app-dir", app_dir,
+         "--port", str(port), "--log-level", "warning", "--no-access-log"],
+        cwd=workdir, env=env, stdout=subprocess.DEVNULL,
+    )
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60) as client:
+            await wait_until_up(client, server)
+            headers, quiz_answers = await prepare(client, quizzes, questions)
+            results = await drive(client, headers, quiz_answers, concurrency, seconds)
+    finally:
+        server.terminate()
+        server.wait()
+        shutil.rmtree(workdir, ignore_errors=True)
+    print(f"app_dir={app_dir} concurrency={concurrency} seconds={seconds} quizzes={quizzes} questions={questions}")
+    report(results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app-dir", default=os.path.dirname(os.path.abspath(__file__)))
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--seconds", type=float, default=15.0)
+    parser.add_argument("--quizzes", type=int, default=20)
+    parser.add_argument("--questions", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(os.path.abspath(args.app_dir), args.concurrency, args.seconds, args.quizzes, args.questions))
@@ -0,0 +1,114 @@
+"""
+bench_password_hashing.py
+-------------------------
+Concurrent POST /users/login against the app in-process (httpx ASGI transport, a
+throwaway SQLite file), first hashing inline on the event loop as login used to
+(PASSWORD_HASH_WORKERS=0) and then through the process pool.
+
+While the logins run, a probe requests GET /metrics/quiz-cache every 10 ms; its
+latency shows how long other requests wait behind Argon2.
+
+    python bench_password_hashing.py --logins 200 --concurrency 50 --workers 4
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+# api_app opens ./api.db, so run from a scratch directory
+os.chdir(tempfile.mkdtemp(prefix="bench_password_hashing_"))
+
+import api_app  # noqa: E402
+from password_hashing import PasswordHashingPool  # noqa: E402
+
+PASSWORD = "correct horse battery staple"
+
+
+def prepare(users: int):
+    api_app.on_startup()
+    hashed_password = PasswordHashingPool(workers=0).hash_blocking(PASSWORD)
+    with api_app.SessionLocal() as db:
+        db.add_all(api_app.User(username=f"user{i}", hashed_password=hashed_password) for i in range(users))
+        db.commit()
+
+
+async def run(logins: int, concurrency: int, users: int) -> dict:
+    transport = httpx.ASGITransport(app=api_app.app)
+    results = {"ok": 0, "rejected": 0, "probe_latency": []}
+    done = asyncio.Event()
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def probe():
+            while not done.is_set():
+                start = time.perf_counter()
+                await client.get("/metrics/quiz-cache")
+                results["probe_latency"].append(time.perf_counter() - start)
+                await asyncio.sleep(0.01)
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def login(i: int):
+            async with semaphore:
+                response = await client.post(
+                    "/users/login", data={"username": f"user{i % users}", "password": PASSWORD}
+                )
+            if response.status_code == 200:
+                results["ok"] += 1
+            elif response.status_code == 503:
+                results["rejected"] += 1
+            else:
+                raise RuntimeError(f"login failed: {response.status_code} {response.text}")
+
+        prober = asyncio.create_task(probe())
+        start = time.perf_counter()
+        await asyncio.gather(*(login(i) for i in range(logins)))
+        results["elapsed"] = time.perf_counter() - start
+        done.set()
+        await prober
+    return results
+
+
+def report(label: str, results: dict):
+    latencies = sorted(results["probe_latency"])
+    p99 = statistics.quantiles(latencies, n=100, method="inclusive")[98] if len(latencies) > 1 else (latencies or [0.0])[0]
+    print(
+        f"{label:<8} logins/s={results['ok'] / results['elapsed']:7.1f} "
+        f"(ok {results['ok']}, rejected {results['rejected']}, {results['elapsed']:.2f}s)  "
+        f"probe p50={statistics.median(latencies) * 1000:7.1f} ms p99={p99 * 1000:7.1f} ms "
+        f"max={latencies[-1] * 1000:7.1f} ms ({len(latencies)} probes)"
+    )
+
+
+def main(logins: int, concurrency: int, workers: int, max_pending: int):
+    users = min(logins, 100)
+    prepare(users)
+    measured = []
+    for label, pool in (
+        ("inline", PasswordHashingPool(workers=0, max_pending=max_pending)),
+        ("pool", PasswordHashingPool(workers=workers, max_pending=max_pending)),
+    ):
+        api_app.password_hasher = pool
+        pool.start()
+        try:
+            measured.append((label, asyncio.run(run(logins, concurrency, users))))
+        finally:
+            pool.stop()
+    print(f"logins={logins} concurrency={concurrency} workers={workers} max_pending={max_pending} cpus={os.cpu_count()}")
+    for label, results in measured:
+        report(label, results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+    parser.add_argument("--max-pending", type=int, default=64)
+    args = parser.parse_args()
+    main(args.logins, args.concurrency, args.workers, args.max_pending)
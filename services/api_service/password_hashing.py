@@ -0,0 +1,156 @@
+# password_hashing.py
+"""
+Argon2 password hashing off the event loop.
+
+An Argon2 hash is deliberately slow (tens of milliseconds and 64 MiB of memory with
+the library defaults). Calling it inline from an async endpoint stalls every other
+request for that long, so a login storm at the start of a live session would freeze
+the whole service. PasswordHashingPool runs hashes in a small process pool instead:
+
+- the pool is bounded (PASSWORD_HASH_WORKERS processes), so hashing cannot take more
+  CPU and memory than that, whatever the request rate
+- at most PASSWORD_HASH_MAX_PENDING hashes may be queued or running; beyond that
+  HashingOverloaded is raised immediately, rather than letting callers wait behind a
+  queue that outlives their HTTP timeouts
+- verify() also reports a replacement hash when the stored one was made with other
+  Argon2 parameters (ARGON2_*), so logins can upgrade hashes transparently
+
+PASSWORD_HASH_WORKERS=0 hashes in the calling thread (same limits), for platforms
+without multiprocessing or for debugging.
+
+The functions below run in the worker processes; this module is kept free of the
+service's app and database code so the workers import nothing else.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Optional, Tuple
+
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
+
+ARGON2_TIME_COST = int(os.getenv("ARGON2_TIME_COST", "3"))
+ARGON2_MEMORY_COST_KIB = int(os.getenv("ARGON2_MEMORY_COST_KIB", "65536"))
+ARGON2_PARALLELISM = int(os.getenv("ARGON2_PARALLELISM", "4"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+
+
+class HashingOverloaded(Exception):
+    """Too many hashes queued; the caller should answer 503 and let the client retry."""
+
+
+_hasher: Optional[PasswordHasher] = None
+
+
+def _init_worker(time_cost: int, memory_cost: int, parallelism: int):
+    global _hasher
+    _hasher = PasswordHasher(time_cost=time_cost, memory_cost=memory_cost, parallelism=parallelism)
+
+
+def _hash(password: str) -> str:
+    return _hasher.hash(password)
+
+
+def _verify(hashed_password: str, password: str) -> Tuple[bool, Optional[str]]:
+    """(matches, new hash if the stored one should be upgraded to the current parameters)"""
+    try:
+        _hasher.verify(hashed_password, password)
+    except (VerificationError, InvalidHashError):
+        return False, None
+    if _hasher.check_needs_rehash(hashed_password):
+        return True, _hasher.hash(password)
+    return True, None
+
+
+class PasswordHashingPool:
+    def __init__(
+        self,
+        workers: int = PASSWORD_HASH_WORKERS,
+        max_pending: int = PASSWORD_HASH_MAX_PENDING,
+        time_cost: int = ARGON2_TIME_COST,
+        memory_cost: int = ARGON2_MEMORY_COST_KIB,
+        parallelism: int = ARGON2_PARALLELISM,
+    ):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.params = (time_cost, memory_cost, parallelism)
+        self.pending = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        if workers <= 0:
+            _init_worker(*self.params)
+
+    def start(self):
+        with self._lock:
+            if self._executor is None and self.workers > 0:
+                # Never fork the server process itself (open sockets, SQLite connections, threads)
+                methods = multiprocessing.get_all_start_methods()
+                context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=context,
+                    initializer=_init_worker, initargs=self.params,
+                )
+
+    def stop(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, fn, *args) -> Future:
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise HashingOverloaded()
+            self.pending += 1
+        try:
+            if self.workers > 0:
+                if self._executor is None:
+                    self.start()
+                future = self._executor.submit(fn, *args)
+            else:
+                future = Future()
+                try:
+                    future.set_result(fn(*args))
+                except Exception as e:
+                    future.set_exception(e)
+        except BaseException:
+            self._done(None)
+            raise
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, _future):
+        with self._lock:
+            self.pending -= 1
+
+    # Async endpoints await these; the event loop stays free while the hash runs
+    async def hash(self, password: str) -> str:
+        return await asyncio.wrap_future(self._submit(_hash, password))
+
+    async def verify(self, hashed_password: str, password: str) -> Tuple[bool, Optional[str]]:
+        return await asyncio.wrap_future(self._submit(_verify, hashed_password, password))
+
+    # Sync endpoints (already running in the threadpool) block on these instead
+    def hash_blocking(self, password: str) -> str:
+        return self._submit(_hash, password).result()
+
+    def verify_blocking(self, hashed_password: str, password: str) -> Tuple[bool, Optional[str]]:
+        return self._submit(_verify, hashed_password, password).result()
+
+    def stats(self) -> dict:
+        time_cost, memory_cost, parallelism = self.params
+        return {
+            "workers": self.workers,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "rejected": self.rejected,
+            "time_cost": time_cost,
+            "memory_cost_kib": memory_cost,
+            "parallelism": parallelism,
+        }
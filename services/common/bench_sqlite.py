@@ -0,0 +1,135 @@
+"""
+bench_sqlite.py
+---------------
+Concurrent readers and writers against one SQLite file, first with the engine the
+services used to build (bare create_engine: rollback journal, synchronous=FULL,
+one shared pool) and then with sqlite_db (WAL, tuned pragmas, separate read-only pool).
+
+Writers commit one small row per transaction (like POST /events); readers run a
+filtered count plus a short range scan (like the query endpoints).
+
+    python bench_sqlite.py --readers 8 --writers 2 --seconds 5
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+import sqlite_db
+
+PRELOAD_ROWS = 20000
+
+
+def prepare(engine):
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE events (id INTEGER PRIMARY KEY, kind TEXT, score REAL, created_at REAL)"))
+        conn.execute(text("CREATE INDEX ix_events_kind ON events (kind, created_at)"))
+        conn.execute(
+            text("INSERT INTO events (kind, score, created_at) VALUES (:kind, :score, :created_at)"),
+            [{"kind": f"k{i % 10}", "score": i % 101, "created_at": time.time()} for i in range(PRELOAD_ROWS)],
+        )
+
+
+def run(write_engine, read_engine, readers: int, writers: int, seconds: float) -> dict:
+    stop = threading.Event()
+    lock = threading.Lock()
+    results = {"writes": 0, "reads": 0, "write_errors": 0, "read_errors": 0, "read_latency": [], "write_latency": []}
+
+    def writer(n):
+        done = errors = 0
+        latencies = []
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                with write_engine.begin() as conn:
+                    conn.execute(
+                        text("INSERT INTO events (kind, score, created_at) VALUES (:kind, :score, :created_at)"),
+                        {"kind": f"k{n % 10}", "score": done % 101, "created_at": time.time()},
+                    )
+                done += 1
+                latencies.append(time.perf_counter() - start)
+            except OperationalError:
+                errors += 1
+        with lock:
+            results["writes"] += done
+            results["write_errors"] += errors
+            results["write_latency"].extend(latencies)
+
+    def reader(n):
+        done = errors = 0
+        latencies = []
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                with read_engine.connect() as conn:
+                    conn.execute(text("SELECT count(*), avg(score) FROM events WHERE kind = :kind"), {"kind": f"k{n % 10}"}).all()
+                    conn.execute(text("SELECT * FROM events ORDER BY id DESC LIMIT 50")).all()
+                done += 1
+                latencies.append(time.perf_counter() - start)
+            except OperationalError:
+                errors += 1
+        with lock:
+            results["reads"] += done
+            results["read_errors"] += errors
+            results["read_latency"].extend(latencies)
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    threads += [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def p99(latencies) -> float:
+    if len(latencies) < 2:
+        return latencies[0] if latencies else 0.0
+    return statistics.quantiles(latencies, n=100)[98]
+
+
+def report(label: str, results: dict, seconds: float):
+    print(
+        f"{label:<9} writes/s={results['writes'] / seconds:8.1f} (p99 {p99(results['write_latency']) * 1000:7.1f} ms, "
+        f"errors {results['write_errors']})  "
+        f"reads/s={results['reads'] / seconds:8.1f} (p99 {p99(results['read_latency']) * 1000:7.1f} ms, "
+        f"errors {results['read_errors']})"
+    )
+
+
+def main(readers: int, writers: int, seconds: float):
+    with tempfile.TemporaryDirectory() as directory:
+        baseline_url = f"sqlite:///{os.path.join(directory, 'baseline.db')}"
+        baseline = create_engine(baseline_url, connect_args={"check_same_thread": False})
+        prepare(baseline)
+        before = run(baseline, baseline, readers, writers, seconds)
+        baseline.dispose()
+
+        tuned_url = f"sqlite:///{os.path.join(directory, 'tuned.db')}"
+        tuned = sqlite_db.create_sqlite_engine(tuned_url)
+        prepare(tuned)
+        tuned_reader = sqlite_db.create_read_engine(tuned_url, tuned)
+        after = run(tuned, tuned_reader, readers, writers, seconds)
+        tuned_reader.dispose()
+        tuned.dispose()
+
+    print(f"readers={readers} writers={writers} seconds={seconds}")
+    report("baseline", before, seconds)
+    report("tuned", after, seconds)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+    main(args.readers, args.writers, args.seconds)
@@ -0,0 +1,150 @@
+# sqlite_db.py
+"""
+Shared SQLAlchemy engine setup for the services' SQLite databases.
+
+create_sqlite_engine() replaces a bare create_engine("sqlite:///..."):
+- WAL journal, so readers never block the writer and the writer never blocks readers
+- synchronous=NORMAL (safe with WAL: a power loss can drop the last commits, never corrupt)
+- a busy timeout, so a writer waits for the lock instead of failing with "database is locked"
+- larger page cache, in-memory temp tables and memory-mapped reads
+- a bounded connection pool; pragmas are applied once per pooled connection
+
+create_read_engine() opens the same file read-only (mode=ro, query_only) with its own
+pool, so read-heavy endpoints get connections that can never take the write lock.
+Bind a second sessionmaker to it once the schema exists:
+
+    engine = create_sqlite_engine(DATABASE_URL)
+    SessionLocal = sessionmaker(bind=engine)
+    ReadSessionLocal = sessionmaker(bind=engine)
+    ...
+    Base.metadata.create_all(bind=engine)
+    ReadSessionLocal.configure(bind=create_read_engine(DATABASE_URL, engine))
+
+create_async_sqlite_engine() is the same setup for async endpoints (SQLAlchemy asyncio
+over aiosqlite), so queries there await instead of blocking the event loop:
+
+    async_engine = create_async_sqlite_engine(DATABASE_URL)
+    AsyncSessionLocal = async_sessionmaker(bind=async_engine, expire_on_commit=False)
+
+Non-SQLite URLs are passed through to create_engine unchanged.
+
+Every setting can be overridden from the environment (SQLITE_*).
+"""
+
+import os
+import sqlite3
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.pool import StaticPool
+
+try:
+    from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+except ImportError:  # SQLAlchemy built without asyncio support (no greenlet)
+    AsyncEngine = create_async_engine = None
+
+JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))
+MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", "8"))
+MAX_OVERFLOW = int(os.getenv("SQLITE_MAX_OVERFLOW", "8"))
+READ_POOL_SIZE = int(os.getenv("SQLITE_READ_POOL_SIZE", "8"))  # 0 -> reads share the read-write engine
+
+
+def _is_file_database(url) -> bool:
+    return url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:")
+
+
+def apply_pragmas(dbapi_connection, read_only: bool = False):
+    cursor = dbapi_connection.cursor()
+    try:
+        if not read_only:
+            # journal_mode is persistent in the file; read-only connections just use it
+            cursor.execute(f"PRAGMA journal_mode={JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous={SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KB}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+        if read_only:
+            cursor.execute("PRAGMA query_only=ON")
+    finally:
+        cursor.close()
+
+
+def create_sqlite_engine(database_url: str, **kwargs) -> Engine:
+    url = make_url(database_url)
+    if url.get_backend_name() != "sqlite":
+        return create_engine(database_url, **kwargs)
+    connect_args = {"check_same_thread": False, "timeout": BUSY_TIMEOUT_MS / 1000}
+    connect_args.update(kwargs.pop("connect_args", {}))
+    if not _is_file_database(url):
+        # In-memory databases exist per connection, so everyone has to share one
+        return create_engine(database_url, connect_args=connect_args, poolclass=StaticPool, **kwargs)
+    engine = create_engine(
+        database_url,
+        connect_args=connect_args,
+        pool_size=POOL_SIZE,
+        max_overflow=MAX_OVERFLOW,
+        **kwargs,
+    )
+    event.listen(engine, "connect", lambda dbapi_connection, _: apply_pragmas(dbapi_connection))
+    return engine
+
+
+def create_read_engine(database_url: str, write_engine: Engine) -> Engine:
+    """
+    Read-only engine on the same SQLite file, or write_engine itself when that is not
+    possible (other backends, in-memory databases, SQLITE_READ_POOL_SIZE=0).
+    Call it after the schema exists: a read-only connection cannot create the file.
+    """
+    url = make_url(database_url)
+    if READ_POOL_SIZE <= 0 or not _is_file_database(url):
+        return write_engine
+    path = os.path.abspath(url.database)
+    engine = create_engine(
+        f"sqlite:///{path}",
+        creator=lambda: _connect_read_only(path),
+        pool_size=READ_POOL_SIZE,
+        max_overflow=MAX_OVERFLOW,
+    )
+    event.listen(engine, "connect", lambda dbapi_connection, _: apply_pragmas(dbapi_connection, read_only=True))
+    return engine
+
+
+def create_async_sqlite_engine(database_url: str, **kwargs) -> "AsyncEngine":
+    """
+    Async counterpart of create_sqlite_engine: "sqlite://" URLs are switched to the
+    aiosqlite driver and get the same pragmas and pool bounds.
+    """
+    if create_async_engine is None:
+        raise RuntimeError("async database access needs SQLAlchemy's asyncio extra (greenlet) and aiosqlite")
+    url = make_url(database_url)
+    if url.get_backend_name() != "sqlite":
+        return create_async_engine(database_url, **kwargs)
+    url = url.set(drivername="sqlite+aiosqlite")
+    connect_args = {"check_same_thread": False, "timeout": BUSY_TIMEOUT_MS / 1000}
+    connect_args.update(kwargs.pop("connect_args", {}))
+    if not _is_file_database(url):
+        return create_async_engine(url, connect_args=connect_args, poolclass=StaticPool, **kwargs)
+    engine = create_async_engine(
+        url,
+        connect_args=connect_args,
+        pool_size=POOL_SIZE,
+        max_overflow=MAX_OVERFLOW,
+        **kwargs,
+    )
+    # Pool events live on the sync facade; the adapted connection runs PRAGMAs synchronously
+    event.listen(engine.sync_engine, "connect", lambda dbapi_connection, _: apply_pragmas(dbapi_connection))
+    return engine
+
+
+def _connect_read_only(path: str):
+    return sqlite3.connect(
+        f"file:{path}?mode=ro",
+        uri=True,
+        check_same_thread=False,
+        timeout=BUSY_TIMEOUT_MS / 1000,
+    )
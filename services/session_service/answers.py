@@ -0,0 +1,181 @@
+# answers.py
+import logging
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+from leaderboard import Leaderboard
+from scheduler import TimerHandle, TimerScheduler
+
+logging.basicConfig(level=logging.INFO, format="[%(asctime)s] [%(levelname)s] %(message)s", datefmt="%H:%M:%S")
+
+ANSWER_SCORED = "answer_scored"
+QUIZ_COMPLETED = "quiz_completed"
+
+
+def build_answer_key(quiz: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """question_id -> {"correct": option key, "options": set of valid option keys}"""
+    return {
+        question["id"]: {"correct": question["correct_answer"], "options": set(question.get("options") or {})}
+        for question in quiz.get("questions", [])
+    }
+
+
+def event_id(*parts: str) -> str:
+    """Deterministic event id, so re-sending the same result is a no-op in analytics."""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, "/".join(parts)))
+
+
+class ParticipantScore:
+    __slots__ = ("user_id", "answers", "correct")
+
+    def __init__(self, user_id: str):
+        self.user_id = user_id
+        self.answers: Dict[str, str] = {}
+        self.correct = 0
+
+
+class AnswerPipeline:
+    """
+    Scores live answers against a preloaded answer key:
+     - submit() is synchronous and O(1): validate, score, append to a pending batch
+     - pending results are persisted as one analytics batch every flush_interval
+       seconds (or as soon as batch_size results are pending), off the answer path
+     - finalize() persists one 'quiz_completed' event per participant with the server-side score
+    """
+
+    def __init__(self, session_id: str, quiz_id: str, answer_key: Dict[str, Dict[str, Any]],
+                 scheduler: TimerScheduler, persist: Callable, flush_interval: float = 1.0,
+                 batch_size: int = 500, leaderboard: Optional[Leaderboard] = None):
+        self.session_id = session_id
+        self.quiz_id = quiz_id
+        self.answer_key = answer_key
+        self.scheduler = scheduler
+        self.persist = persist  # async callable(events: list, durable: bool)
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.participants: Dict[str, ParticipantScore] = {}
+        self.leaderboard = leaderboard if leaderboard is not None else Leaderboard()
+        self._pending: List[Dict[str, Any]] = []
+        self._flush_timer: Optional[TimerHandle] = None
+
+    def score_of(self, participant: ParticipantScore) -> float:
+        if not self.answer_key:
+            return 0.0
+        return participant.correct / len(self.answer_key) * 100
+
+    def submit(self, user_id: str, question_id: str, answer: str, open_question_id: Optional[str]) -> Dict[str, Any]:
+        """Validate and score one answer. Only the currently open question accepts answers, once per user."""
+        if not user_id:
+            return {"accepted": False, "reason": "missing user_id"}
+        # Values come straight from client JSON: anything but strings can't be a key or an option
+        if not isinstance(user_id, str):
+            return {"accepted": False, "reason": "invalid user_id"}
+        if not isinstance(question_id, str):
+            return {"accepted": False, "reason": "unknown question"}
+        if not isinstance(answer, str):
+            return {"accepted": False, "reason": "invalid option"}
+        entry = self.answer_key.get(question_id)
+        if entry is None:
+            return {"accepted": False, "reason": "unknown question"}
+        if question_id != open_question_id:
+            return {"accepted": False, "reason": "question not open"}
+        if answer not in entry["options"]:
+            return {"accepted": False, "reason": "invalid option"}
+        participant = self.participants.get(user_id)
+        if participant is None:
+            participant = self.participants[user_id] = ParticipantScore(user_id)
+            self.leaderboard.update(user_id, 0)
+        if question_id in participant.answers:
+            return {"accepted": False, "reason": "already answered"}
+
+        correct = answer == entry["correct"]
+        participant.answers[question_id] = answer
+        if correct:
+            participant.correct += 1
+            self.leaderboard.update(user_id, participant.correct)
+        self._pending.append({
+            "id": event_id(self.session_id, user_id, question_id),
+            "event_type": ANSWER_SCORED,
+            "payload": {
+                "sessionId": self.session_id,
+                "quizId": self.quiz_id,
+                "userId": user_id,
+                "questionId": question_id,
+                "answer": answer,
+                "correct": correct,
+                "answeredAt": time.time(),
+            },
+        })
+        self._schedule_flush()
+        return {"accepted": True}
+
+    def restore(self, participants: Dict[str, Dict[str, str]]):
+        """Rebuild scores from checkpointed answers (user -> {question_id: answer}) after a failover."""
+        self.participants.clear()
+        for user_id, answers in participants.items():
+            participant = self.participants[user_id] = ParticipantScore(user_id)
+            participant.answers = dict(answers)
+            participant.correct = sum(
+                1 for question_id, answer in answers.items()
+                if self.answer_key.get(question_id, {}).get("correct") == answer
+            )
+            self.leaderboard.update(user_id, participant.correct)
+
+    def _schedule_flush(self):
+        if len(self._pending) >= self.batch_size:
+            if self._flush_timer:
+                self._flush_timer.cancel()
+            self._flush_timer = self.scheduler.call_later(0, self.flush)
+        elif self._flush_timer is None:
+            self._flush_timer = self.scheduler.call_later(self.flush_interval, self.flush)
+
+    async def flush(self):
+        self._flush_timer = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        try:
+            await self.persist(batch, False)
+        except Exception as e:
+            logging.error(f"[{self.session_id}] Failed to persist {len(batch)} answers, will retry: {e}")
+            self._pending[:0] = batch
+            if self._flush_timer is None:
+                self._flush_timer = self.scheduler.call_later(self.flush_interval, self.flush)
+
+    async def finalize(self):
+        """Flush outstanding answers and record each participant's final server-side score."""
+        if self._flush_timer:
+            self._flush_timer.cancel()
+        await self.flush()
+        results = [
+            {
+                "id": event_id(self.session_id, participant.user_id, QUIZ_COMPLETED),
+                "event_type": QUIZ_COMPLETED,
+                "payload": {
+                    "sessionId": self.session_id,
+                    "quizId": self.quiz_id,
+                    "userId": participant.user_id,
+                    "score": self.score_of(participant),
+                    "answers": participant.answers,
+                    "results": {
+                        question_id: participant.answers.get(question_id) == entry["correct"]
+                        for question_id, entry in self.answer_key.items()
+                    },
+                },
+            }
+            for participant in self.participants.values()
+        ]
+        if results:
+            await self._persist_results(results)
+
+    async def _persist_results(self, results: List[Dict[str, Any]], attempt: int = 1, max_attempts: int = 5):
+        try:
+            await self.persist(results, True)
+        except Exception as e:
+            if attempt >= max_attempts:
+                logging.error(f"[{self.session_id}] Giving up on final results after {attempt} attempts: {e}")
+                return
+            delay = self.flush_interval * (2 ** attempt)
+            logging.error(f"[{self.session_id}] Failed to persist final results, retrying in {delay}s: {e}")
+            self.scheduler.call_later(delay, self._persist_results, results, attempt + 1, max_attempts)
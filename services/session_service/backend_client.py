@@ -0,0 +1,45 @@
+# backend_client.py
+import logging
+import os
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+logging.basicConfig(level=logging.INFO, format="[%(asctime)s] [%(levelname)s] %(message)s", datefmt="%H:%M:%S")
+
+API_SERVICE_URL = os.getenv("API_SERVICE_URL", "http://127.0.0.1:8001")
+ANALYTICS_SERVICE_URL = os.getenv("ANALYTICS_SERVICE_URL", "http://127.0.0.1:8000")
+BACKEND_TIMEOUT = float(os.getenv("BACKEND_TIMEOUT", "5.0"))
+
+# One pooled client for calls to api_service and analytics_service, opened on startup
+_client: Optional[httpx.AsyncClient] = None
+
+
+async def open_client():
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(timeout=BACKEND_TIMEOUT)
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def fetch_quiz(quiz_id: str) -> Dict[str, Any]:
+    """Load a quiz (with questions and correct answers) from api_service."""
+    response = await _client.get(f"{API_SERVICE_URL}/quizzes/{quiz_id}")
+    response.raise_for_status()
+    return response.json()
+
+
+async def post_events(events: List[Dict[str, Any]], durable: bool = False):
+    """Send events to analytics_service in one batch. Events should carry an id (idempotency key)."""
+    response = await _client.post(
+        f"{ANALYTICS_SERVICE_URL}/events/batch",
+        params={"durable": "true"} if durable else None,
+        json={"events": events},
+    )
+    response.raise_for_status()
@@ -0,0 +1,102 @@
+"""
+bench_broadcast.py
+------------------
+Broadcasts questions to simulated WebSocket clients (10k by default, a few of
+them slow) and compares the old serial `await ws.send_json` loop with the
+per-connection queue fan-out in main.broadcast.
+
+    python bench_broadcast.py --clients 10000 --slow 10 --slow-delay 0.05 --messages 5
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+
+os.environ.setdefault("DEMO_SESSION_ID", "")
+
+import main  # noqa: E402
+
+# Per-connection INFO logs would dominate the measurement
+logging.getLogger().setLevel(logging.WARNING)
+
+SESSION_ID = "bench-session"
+
+
+class FakeWebSocket:
+    """Stands in for a Starlette WebSocket; slow clients take `delay` seconds per send."""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.received = 0
+        self.last_received_at = 0.0
+
+    async def send_text(self, data: str):
+        await asyncio.sleep(self.delay)
+        self.received += 1
+        self.last_received_at = time.perf_counter()
+
+    async def send_json(self, data: dict):
+        await self.send_text(json.dumps(data))
+
+    async def close(self, code: int = 1000):
+        pass
+
+
+def make_sockets(clients: int, slow: int, slow_delay: float):
+    return [FakeWebSocket(slow_delay if i < slow else 0.0) for i in range(clients)]
+
+
+def question(n: int) -> dict:
+    return {"type": "question", "session_id": SESSION_ID, "question_id": f"q{n}", "text": f"Question #{n}"}
+
+
+async def bench_serial(sockets, messages: int) -> float:
+    """The pre-fan-out behaviour: one awaited send per client, in order."""
+    start = time.perf_counter()
+    for n in range(messages):
+        for ws in sockets:
+            await ws.send_json(question(n))
+    fast = [ws for ws in sockets if ws.delay == 0]
+    return max(ws.last_received_at for ws in fast) - start
+
+
+async def bench_fanout(sockets, messages: int):
+    conns = [main.add_connection(SESSION_ID, ws) for ws in sockets]
+    fast = [conn for conn in conns if conn.websocket.delay == 0]
+    start = time.perf_counter()
+    for n in range(messages):
+        await main.broadcast(SESSION_ID, question(n))
+    enqueued = time.perf_counter() - start
+    # Wait until every fast client's queue is drained (or it was cut off by the disconnect policy)
+    while any(len(conn) and not conn.closed for conn in fast):
+        await asyncio.sleep(0.001)
+    await asyncio.sleep(0.001)  # let the last in-flight sends land
+    delivered = max((conn.websocket.last_received_at for conn in fast if conn.websocket.received), default=start) - start
+    dropped = sum(conn.dropped for conn in conns)
+    disconnected = sum(conn.closed for conn in conns)
+    for conn in conns:
+        await conn.close()
+    return enqueued, delivered, dropped, disconnected
+
+
+async def main_async(clients: int, slow: int, slow_delay: float, messages: int):
+    serial = await bench_serial(make_sockets(clients, slow, slow_delay), messages)
+    enqueued, delivered, dropped, disconnected = await bench_fanout(make_sockets(clients, slow, slow_delay), messages)
+    print(f"clients={clients} slow={slow} slow_delay={slow_delay}s messages={messages} policy={main.SLOW_CONSUMER_POLICY}")
+    print(f"serial send_json loop : fast clients served after {serial * 1000:9.1f} ms")
+    print(f"queued fan-out        : broadcast() returned after {enqueued * 1000:9.1f} ms, "
+          f"fast clients served after {delivered * 1000:9.1f} ms "
+          f"(dropped frames: {dropped}, disconnected: {disconnected})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=10000)
+    parser.add_argument("--slow", type=int, default=10)
+    parser.add_argument("--slow-delay", type=float, default=0.05)
+    parser.add_argument("--messages", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main_async(args.clients, args.slow, args.slow_delay, args.messages))
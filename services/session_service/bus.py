@@ -0,0 +1,307 @@
+# bus.py
+import asyncio
+import itertools
+import json
+import logging
+import os
+from typing import Any, Callable, Dict, List, Optional
+
+logging.basicConfig(level=logging.INFO, format="[%(asctime)s] [%(levelname)s] %(message)s", datefmt="%H:%M:%S")
+
+_decoder = json.JSONDecoder()
+
+
+class BroadcastBus:
+    """
+    Local publish/subscribe between session_service workers on the same host,
+    so a master's broadcast reaches clients connected to any worker.
+
+    Every worker listens on a Unix domain socket in bus_dir (<pid>.sock) and keeps
+    one outgoing stream to each peer socket it finds there. publish() writes one
+    line per frame to every peer without awaiting:
+        "<session_id as JSON string> <frame>\\n"
+    and each receiver hands (session_id, frame) to its own local fan-out.
+    A peer whose stream backs up past max_buffer bytes has frames dropped, the
+    same trade-off as the per-client send queues.
+
+    request() asks every peer something only one of them can answer (e.g. "score this
+    answer" for the worker hosting a session's master). Requests and replies travel as
+    JSON object lines on the same streams:
+        {"op": "request", "id": ..., "from": <socket path>, "body": {...}}
+        {"op": "reply", "id": ..., "body": {...}}
+    Each peer passes the body to handle_request; a peer returning None stays silent,
+    and the first reply wins. gather() sends the same request but collects every reply.
+
+    share() replicates small pieces of this worker's state (e.g. "I am the master of
+    session X") to every peer, so they can be read locally with shared() instead of
+    asked for:
+        {"op": "share", "from": <socket path>, "key": ..., "value": ...}
+    A value of None withdraws the key. A peer's values are dropped when its stream
+    closes (the worker exited), and newly found peers are sent everything shared so
+    far. on_shared_change(key) is called whenever the values peers share under a key change.
+    """
+
+    def __init__(self, bus_dir: str, deliver: Callable[[str, str], None],
+                 refresh_interval: float = 1.0, max_buffer: int = 4 * 1024 * 1024,
+                 handle_request: Optional[Callable[[Dict[str, Any]], Any]] = None,
+                 on_shared_change: Optional[Callable[[str], None]] = None):
+        self.bus_dir = bus_dir
+        self.deliver = deliver  # callable(session_id, frame) for this worker's clients
+        self.handle_request = handle_request  # async callable(body) -> reply body or None
+        self.on_shared_change = on_shared_change  # callable(key)
+        self.refresh_interval = refresh_interval
+        self.max_buffer = max_buffer
+        self.path = os.path.join(bus_dir, f"{os.getpid()}.sock")
+        self.dropped = 0
+        self._peers: Dict[str, asyncio.StreamWriter] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._refresher: Optional[asyncio.Task] = None
+        self._request_ids = itertools.count(1)
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._gathering: Dict[str, _Gather] = {}
+        self._handlers: set = set()
+        self._shared: Dict[str, Any] = {}  # what this worker shares
+        self._peer_shared: Dict[str, Dict[str, Any]] = {}  # peer socket path -> what it shares
+
+    @property
+    def enabled(self) -> bool:
+        return self._server is not None
+
+    async def start(self):
+        if not hasattr(asyncio, "start_unix_server"):
+            logging.warning("Unix domain sockets unavailable; broadcast bus disabled (single worker only).")
+            return
+        os.makedirs(self.bus_dir, exist_ok=True)
+        try:
+            os.unlink(self.path)  # left over by a crashed worker with a recycled pid
+        except FileNotFoundError:
+            pass
+        self._server = await asyncio.start_unix_server(self._serve_peer, path=self.path, limit=self.max_buffer)
+        await self._refresh_peers()
+        self._refresher = asyncio.create_task(self._refresh_loop())
+        logging.info(f"Broadcast bus listening on {self.path} ({len(self._peers)} peer worker(s)).")
+
+    async def stop(self):
+        if self._refresher:
+            self._refresher.cancel()
+            self._refresher = None
+        for task in list(self._handlers):
+            task.cancel()
+        for writer in self._peers.values():
+            writer.close()
+        self._peers.clear()
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+
+    def publish(self, session_id: str, frame: str):
+        """Send an already serialized frame to every other worker. Never awaits."""
+        if not self._peers:
+            return
+        line = f"{json.dumps(session_id)} {frame}\n".encode()
+        for path, writer in list(self._peers.items()):
+            if writer.is_closing():
+                del self._peers[path]
+                continue
+            if writer.transport.get_write_buffer_size() > self.max_buffer:
+                self.dropped += 1
+                continue
+            writer.write(line)
+
+    def _send_control(self, message: Dict[str, Any]) -> int:
+        """Write a control message to every peer. Returns how many it went to."""
+        line = (json.dumps(message) + "\n").encode()
+        sent = 0
+        for path, writer in list(self._peers.items()):
+            if writer.is_closing():
+                del self._peers[path]
+                continue
+            writer.write(line)
+            sent += 1
+        return sent
+
+    async def request(self, body: Dict[str, Any], timeout: float = 1.0) -> Optional[Dict[str, Any]]:
+        """Send body to every peer and return the first reply, or None if none came in time."""
+        if not self._peers:
+            return None
+        request_id = f"{os.getpid()}:{next(self._request_ids)}"
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        try:
+            self._send_control({"op": "request", "id": request_id, "from": self.path, "body": body})
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def gather(self, body: Dict[str, Any], timeout: float = 1.0) -> List[Dict[str, Any]]:
+        """
+        Send body to every peer and return all replies that came in by the time every peer
+        answered or timeout passed. Handlers meant for gather() should always reply.
+        """
+        if not self._peers:
+            return []
+        request_id = f"{os.getpid()}:{next(self._request_ids)}"
+        gathering = self._gathering[request_id] = _Gather()
+        try:
+            gathering.expected = self._send_control({"op": "request", "id": request_id, "from": self.path, "body": body})
+            if gathering.expected:
+                await asyncio.wait_for(gathering.done.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self._gathering.pop(request_id, None)
+        return gathering.replies
+
+    def share(self, key: str, value: Any):
+        """Replicate value under key to every peer (None withdraws it). Never awaits."""
+        if value is None:
+            if self._shared.pop(key, None) is None:
+                return
+        else:
+            self._shared[key] = value
+        self._send_control({"op": "share", "from": self.path, "key": key, "value": value})
+
+    def shared(self, key: str) -> List[Any]:
+        """Values peers currently share under key."""
+        return [values[key] for values in self._peer_shared.values() if key in values]
+
+    def _update_shared(self, peer: str, key: str, value: Any):
+        values = self._peer_shared.setdefault(peer, {})
+        if value is None:
+            if values.pop(key, None) is None:
+                return
+        else:
+            values[key] = value
+        self._shared_changed(key)
+
+    def _forget_peer(self, peer: str):
+        for key in self._peer_shared.pop(peer, {}):
+            self._shared_changed(key)
+
+    def _shared_changed(self, key: str):
+        if self.on_shared_change is None:
+            return
+        try:
+            self.on_shared_change(key)
+        except Exception as e:
+            logging.error(f"Broadcast bus: shared state callback failed: {e}")
+
+    async def _answer(self, message: Dict[str, Any]):
+        try:
+            body = await self.handle_request(message["body"])
+        except Exception as e:
+            logging.error(f"Broadcast bus: request handler failed: {e}")
+            return
+        if body is None:
+            return
+        writer = self._peers.get(message["from"])
+        if writer is None or writer.is_closing():
+            # Requester started after our last peer scan
+            writer = await self._connect(message["from"])
+            if writer is None:
+                return
+        writer.write((json.dumps({"op": "reply", "id": message["id"], "body": body}) + "\n").encode())
+
+    def _handle_control(self, line: bytes, senders: set):
+        try:
+            message = json.loads(line)
+        except ValueError:
+            logging.warning("Broadcast bus: discarding malformed control message.")
+            return
+        op = message.get("op")
+        if op == "request" and self.handle_request is not None:
+            task = asyncio.create_task(self._answer(message))
+            self._handlers.add(task)
+            task.add_done_callback(self._handlers.discard)
+        elif op == "reply":
+            future = self._pending.get(message.get("id"))
+            if future is not None and not future.done():
+                future.set_result(message.get("body"))
+            gathering = self._gathering.get(message.get("id"))
+            if gathering is not None:
+                gathering.add(message.get("body"))
+        elif op == "share":
+            # Remember who shared over this stream, to forget their state when it closes
+            senders.add(message["from"])
+            self._update_shared(message["from"], message["key"], message.get("value"))
+
+    async def _serve_peer(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        senders: set = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if line.startswith(b"{"):
+                    # Frame lines start with the JSON-quoted session id; objects are control messages
+                    self._handle_control(line, senders)
+                    continue
+                try:
+                    session_id, end = _decoder.raw_decode(line.decode())
+                except ValueError:
+                    logging.warning("Broadcast bus: discarding malformed frame.")
+                    continue
+                self.deliver(session_id, line[end + 1:-1].decode())
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError) as e:
+            logging.warning(f"Broadcast bus: peer stream failed: {e}")
+        finally:
+            writer.close()
+            for peer in senders:
+                self._forget_peer(peer)
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self._refresh_peers()
+            except Exception as e:
+                logging.error(f"Broadcast bus: peer refresh failed: {e}")
+
+    async def _refresh_peers(self):
+        """Connect to workers that appeared in bus_dir since the last scan."""
+        for entry in os.scandir(self.bus_dir):
+            path = entry.path
+            if not entry.name.endswith(".sock") or path == self.path:
+                continue
+            writer = self._peers.get(path)
+            if writer is not None and not writer.is_closing():
+                continue
+            await self._connect(path)
+
+    async def _connect(self, path: str) -> Optional[asyncio.StreamWriter]:
+        try:
+            _, writer = await asyncio.open_unix_connection(path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            # Nobody listening: the worker died without cleaning up
+            self._peers.pop(path, None)
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            return None
+        self._peers[path] = writer
+        logging.info(f"Broadcast bus: connected to peer worker {os.path.basename(path)}.")
+        for key, value in self._shared.items():
+            writer.write((json.dumps({"op": "share", "from": self.path, "key": key, "value": value}) + "\n").encode())
+        return writer
+
+
+class _Gather:
+    """Replies collected by one BroadcastBus.gather() call."""
+
+    def __init__(self):
+        self.expected = 0
+        self.replies: List[Dict[str, Any]] = []
+        self.done = asyncio.Event()
+
+    def add(self, body: Dict[str, Any]):
+        self.replies.append(body)
+        if len(self.replies) >= self.expected:
+            self.done.set()
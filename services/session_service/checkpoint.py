@@ -0,0 +1,96 @@
+# checkpoint.py
+import json
+import logging
+import os
+from typing import Any, Callable, Dict, Optional
+
+logging.basicConfig(level=logging.INFO, format="[%(asctime)s] [%(levelname)s] %(message)s", datefmt="%H:%M:%S")
+
+
+class CheckpointLog:
+    """
+    Append-only session state log next to the coordinator lock (.locks/<session>.ckpt).
+    One JSON line per transition:
+        {"t": "question", "n": 3, "question_id": "...", "deadline": epoch, "token": 7}
+        {"t": "answer", "user": "...", "q": "...", "a": "b", "token": 7}
+        {"t": "finished", "token": 7}
+        {"t": "snapshot", "state": {...}, "token": 7}   (written by compact())
+    Lines are flushed to the OS on every append, so they survive a master process crash.
+    Records stamped with a fencing token lower than one already seen came from a
+    replaced master and are ignored on replay.
+    """
+
+    def __init__(self, session_id: str, lock_dir=".locks", compact_every: int = 5000):
+        self.session_id = session_id
+        self.path = os.path.join(lock_dir, f"{session_id}.ckpt")
+        self.compact_every = compact_every
+        self.appended = 0
+        self._handle = None
+        os.makedirs(lock_dir, exist_ok=True)
+
+    @staticmethod
+    def empty_state() -> Dict[str, Any]:
+        return {"question": 0, "question_id": None, "deadline": None, "participants": {}, "finished": False}
+
+    def append(self, record: Dict[str, Any]):
+        if self._handle is None:
+            self._handle = open(self.path, "a")
+        self._handle.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self._handle.flush()
+        self.appended += 1
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        """Replay the log into a state dict, or None if there is no checkpoint."""
+        try:
+            handle = open(self.path)
+        except FileNotFoundError:
+            return None
+        state = self.empty_state()
+        max_token = None
+        with handle:
+            for line in handle:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break  # torn final line from a crash mid-write
+                token = record.get("token")
+                if token is not None:
+                    if max_token is not None and token < max_token:
+                        continue
+                    max_token = token
+                kind = record.get("t")
+                if kind == "snapshot":
+                    state = record["state"]
+                elif kind == "question":
+                    state.update(question=record["n"], question_id=record["question_id"], deadline=record["deadline"])
+                elif kind == "answer":
+                    state["participants"].setdefault(record["user"], {})[record["q"]] = record["a"]
+                elif kind == "finished":
+                    state.update(finished=True, question_id=None, deadline=None)
+        return state
+
+    def compact(self, state: Dict[str, Any], token: Optional[int] = None):
+        """Replace the log with a single snapshot record."""
+        self.close()
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as handle:
+            handle.write(json.dumps({"t": "snapshot", "state": state, "token": token}, separators=(",", ":")) + "\n")
+        os.replace(tmp_path, self.path)
+        self.appended = 0
+
+    def maybe_compact(self, state_fn: Callable[[], Dict[str, Any]], token: Optional[int] = None):
+        """Compact once compact_every records have been appended; state_fn is only called then."""
+        if self.appended >= self.compact_every:
+            self.compact(state_fn(), token)
+
+    def clear(self):
+        self.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def close(self):
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
@@ -0,0 +1,75 @@
+# connection_registry.py
+import logging
+from typing import Dict, Hashable, Optional, Tuple
+
+logging.basicConfig(level=logging.INFO, format="[%(asctime)s] [%(levelname)s] %(message)s", datefmt="%H:%M:%S")
+
+
+class SessionConnections:
+    """
+    Connections of one session. Membership changes invalidate a cached tuple
+    snapshot, so broadcasts iterate an immutable copy that is rebuilt at most
+    once per change instead of once per broadcast.
+    """
+
+    __slots__ = ("_members", "_snapshot")
+
+    def __init__(self):
+        self._members: Dict[Hashable, None] = {}  # insertion-ordered set
+        self._snapshot: Optional[Tuple] = ()
+
+    def add(self, conn):
+        self._members[conn] = None
+        self._snapshot = None
+
+    def discard(self, conn) -> bool:
+        if self._members.pop(conn, False) is False:
+            return False
+        self._snapshot = None
+        return True
+
+    def snapshot(self) -> Tuple:
+        if self._snapshot is None:
+            self._snapshot = tuple(self._members)
+        return self._snapshot
+
+    def __len__(self):
+        return len(self._members)
+
+
+class ConnectionRegistry:
+    """
+    session_id -> SessionConnections, with no lock at all.
+    Every method runs without awaiting, so on the single event loop thread each
+    call is atomic; sessions never contend with each other and connect/disconnect
+    storms cost O(1) per client.
+    """
+
+    _EMPTY = SessionConnections()
+
+    def __init__(self):
+        self._sessions: Dict[str, SessionConnections] = {}
+
+    def add(self, session_id: str, conn) -> int:
+        conns = self._sessions.get(session_id)
+        if conns is None:
+            conns = self._sessions[session_id] = SessionConnections()
+        conns.add(conn)
+        return len(conns)
+
+    def remove(self, session_id: str, conn) -> bool:
+        conns = self._sessions.get(session_id)
+        if conns is None or not conns.discard(conn):
+            return False
+        if not conns:
+            del self._sessions[session_id]
+        return True
+
+    def snapshot(self, session_id: str) -> Tuple:
+        return self._sessions.get(session_id, self._EMPTY).snapshot()
+
+    def count(self, session_id: str) -> int:
+        return len(self._sessions.get(session_id, self._EMPTY))
+
+    def sessions(self):
+        return list(self._sessions)
@@ -7,12 +7,20 @@ Works on Windows and Linux/Mac — no PostgreSQL needed.
 Demonstrates:
 - Mutual Exclusion
 - Fault Tolerance (auto unlock on crash)
+
+Two backends share one interface (try_acquire_lock / renew / release_lock / retry_delay):
+- FileLockCoordinator (default): flock held for as long as the master lives
+- LeaseCoordinator: TTL lease record with heartbeat renewal and fencing tokens,
+  for sub-second failover when a master dies
 """
 
+import json
 import os
 import time
 import logging
 import sys
+import uuid
+from contextlib import contextmanager
 
 # On Windows, use msvcrt for file locking
 if os.name == "nt":
@@ -28,13 +36,25 @@ logging.basicConfig(
 
 
 class FileLockCoordinator:
-    def __init__(self, session_id: str, lock_dir=".locks"):
+    # The flock lives as long as the process; no heartbeat needed and no fencing token
+    heartbeat_interval = None
+    fencing_token = None
+
+    def __init__(self, session_id: str, lock_dir=".locks", retry_interval: float = 3.0):
         self.session_id = session_id
         self.lock_dir = lock_dir
         self.lock_file_path = os.path.join(lock_dir, f"{session_id}.lock")
+        self.retry_interval = retry_interval
         self.file_handle = None
         os.makedirs(lock_dir, exist_ok=True)
 
+    def retry_delay(self) -> float:
+        """Seconds a standby should wait before the next try_acquire_lock()."""
+        return self.retry_interval
+
+    def renew(self) -> bool:
+        return self.file_handle is not None
+
     def _lock_file(self):
         """Cross-platform lock operation."""
         if os.name == "nt":
@@ -65,6 +85,9 @@ class FileLockCoordinator:
                 return True
             except (BlockingIOError, OSError):
                 logging.info(f"[{self.session_id}] ❌ Lock held by another instance.")
+                # Don't leak a descriptor per retry when many sessions are on standby
+                self.file_handle.close()
+                self.file_handle = None
                 return False
         except Exception as e:
             logging.error(f"[{self.session_id}] Error acquiring file lock: {e}")
@@ -91,6 +114,146 @@ class FileLockCoordinator:
             self.release_lock()
 
 
+
+class LeaseCoordinator:
+    """
+    Lease-based mastership stored as a small JSON record next to the file locks:
+        {"holder": ..., "expires_at": epoch seconds, "token": int}
+    - The master renews the lease every heartbeat_interval (ttl / 3)
+    - A crashed master simply stops renewing; its lease lapses after at most ttl seconds
+    - Each new holder gets token + 1 (fencing token), so stale masters can be told apart
+    - retry_delay() lets a standby sleep until the current lease can expire, re-checking
+      every release_check_interval (ttl / 5) so a clean release is picked up early; a check
+      is a single unlocked read of the lease file
+    Record updates are read-modify-write under a short blocking flock on a guard file;
+    callers on an event loop should run these methods in a thread.
+    """
+
+    def __init__(self, session_id: str, lock_dir=".locks", ttl: float = 0.5,
+                 release_check_interval: float = None):
+        self.session_id = session_id
+        self.lock_dir = lock_dir
+        self.lease_path = os.path.join(lock_dir, f"{session_id}.lease")
+        self.guard_path = os.path.join(lock_dir, f"{session_id}.lease.guard")
+        self.ttl = ttl
+        self.heartbeat_interval = ttl / 3
+        self.release_check_interval = release_check_interval or ttl / 5
+        self.holder_id = f"{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.fencing_token = None
+        self._seen_expires_at = 0.0
+        os.makedirs(lock_dir, exist_ok=True)
+
+    @contextmanager
+    def _guard(self):
+        with open(self.guard_path, "a+") as handle:
+            if os.name == "nt":
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)
+            else:
+                fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if os.name == "nt":
+                    handle.seek(0)
+                    msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+                else:
+                    fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def _read(self) -> dict:
+        try:
+            with open(self.lease_path) as handle:
+                return json.load(handle)
+        except (FileNotFoundError, ValueError):
+            return {"holder": None, "expires_at": 0.0, "token": 0}
+
+    def _write(self, record: dict):
+        tmp_path = f"{self.lease_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as handle:
+            json.dump(record, handle)
+        os.replace(tmp_path, self.lease_path)
+
+    def read_lease(self) -> dict:
+        return self._read()
+
+    def _held_by_other(self, record: dict) -> bool:
+        return record["holder"] not in (None, self.holder_id) and record["expires_at"] > time.time()
+
+    def try_acquire_lock(self) -> bool:
+        try:
+            # Cheap unlocked peek first, so standbys don't contend on the guard while a lease is live
+            record = self._read()
+            if self._held_by_other(record):
+                self._seen_expires_at = record["expires_at"]
+                return False
+            with self._guard():
+                record = self._read()
+                now = time.time()
+                if self._held_by_other(record):
+                    self._seen_expires_at = record["expires_at"]
+                    logging.debug(f"[{self.session_id}] ❌ Lease held by {record['holder']}.")
+                    return False
+                token = record["token"] if record["holder"] == self.holder_id else record["token"] + 1
+                self._write({"holder": self.holder_id, "expires_at": now + self.ttl, "token": token})
+                self.fencing_token = token
+                logging.info(f"[{self.session_id}] ✅ Acquired lease (token {token}, PID {os.getpid()}).")
+                return True
+        except Exception as e:
+            logging.error(f"[{self.session_id}] Error acquiring lease: {e}")
+            return False
+
+    def renew(self) -> bool:
+        """Heartbeat. Returns False if the lease was lost (expired and taken over)."""
+        try:
+            with self._guard():
+                record = self._read()
+                if record["holder"] != self.holder_id or record["token"] != self.fencing_token:
+                    logging.warning(f"[{self.session_id}] Lease lost to {record['holder']}.")
+                    self.fencing_token = None
+                    return False
+                record["expires_at"] = time.time() + self.ttl
+                self._write(record)
+                return True
+        except Exception as e:
+            logging.error(f"[{self.session_id}] Error renewing lease: {e}")
+            return False
+
+    def release_lock(self):
+        try:
+            with self._guard():
+                record = self._read()
+                if record["holder"] == self.holder_id:
+                    # Keep the token so the next holder's token is still higher
+                    self._write({"holder": None, "expires_at": 0.0, "token": record["token"]})
+                    logging.info(f"[{self.session_id}] 🔓 Released lease (token {record['token']}).")
+        except Exception as e:
+            logging.error(f"[{self.session_id}] Error releasing lease: {e}")
+        self.fencing_token = None
+
+    def retry_delay(self) -> float:
+        """Until the lease we last saw can lapse, but no longer than release_check_interval."""
+        remaining = self._seen_expires_at - time.time()
+        return min(remaining, self.release_check_interval) if remaining > 0 else self.release_check_interval
+
+
+def make_coordinator(session_id: str, backend: str = None, **kwargs):
+    """COORDINATOR_BACKEND=file (default) keeps the original flock behaviour; 'lease' enables leases."""
+    backend = backend or os.getenv("COORDINATOR_BACKEND", "file")
+    if backend == "lease":
+        # Standbys retry on the lease's own schedule (retry_delay), not a fixed interval
+        kwargs.pop("retry_interval", None)
+        release_check_interval = os.getenv("LEASE_RELEASE_CHECK_INTERVAL")
+        return LeaseCoordinator(
+            session_id,
+            ttl=float(os.getenv("LEASE_TTL", "0.5")),
+            release_check_interval=float(release_check_interval) if release_check_interval else None,
+            **kwargs,
+        )
+    if backend == "file":
+        return FileLockCoordinator(session_id, **kwargs)
+    raise ValueError(f"Unknown coordinator backend: {backend}")
+
+
 if __name__ == "__main__":
     session_id = "session-101"
     coordinator = FileLockCoordinator(session_id)
@@ -0,0 +1,99 @@
+# fanout.py
+import asyncio
+import logging
+from collections import deque
+from typing import Callable, Optional
+
+logging.basicConfig(level=logging.INFO, format="[%(asctime)s] [%(levelname)s] %(message)s", datefmt="%H:%M:%S")
+
+# What to do when a client's send queue is full:
+#  - drop_oldest: discard the oldest queued frame to make room (client skips ahead)
+#  - drop_newest: discard the frame being enqueued
+#  - disconnect:  close the socket; the client can reconnect
+DROP_OLDEST = "drop_oldest"
+DROP_NEWEST = "drop_newest"
+DISCONNECT = "disconnect"
+SLOW_CONSUMER_POLICIES = (DROP_OLDEST, DROP_NEWEST, DISCONNECT)
+
+# WebSocket close code 1013 = "Try Again Later"
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+# Close tasks started from enqueue(); the event loop only keeps weak references to tasks
+_closing_tasks: set = set()
+
+
+class ClientConnection:
+    """
+    One WebSocket client with its own bounded send queue and writer task.
+    enqueue() never awaits, so a broadcast costs O(clients) appends and a slow
+    socket only ever backs up its own queue.
+    """
+
+    def __init__(self, websocket, session_id: str, max_queue: int = 64,
+                 policy: str = DROP_OLDEST, on_close: Optional[Callable] = None):
+        if policy not in SLOW_CONSUMER_POLICIES:
+            raise ValueError(f"Unknown slow consumer policy: {policy}")
+        self.websocket = websocket
+        self.session_id = session_id
+        self.max_queue = max_queue
+        self.policy = policy
+        self.on_close = on_close  # callable(connection), called once when the writer stops
+        self.dropped = 0
+        self.closed = False
+        self._queue: deque = deque()
+        self._ready = asyncio.Event()
+        self._writer: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._writer = asyncio.create_task(self._write_loop())
+
+    def enqueue(self, frame: str) -> bool:
+        """Queue a pre-serialized frame. Returns False if it was dropped."""
+        if self.closed:
+            return False
+        if len(self._queue) >= self.max_queue:
+            self.dropped += 1
+            if self.policy == DROP_NEWEST:
+                return False
+            if self.policy == DISCONNECT:
+                logging.warning(f"[{self.session_id}] Disconnecting slow consumer ({len(self._queue)} frames queued).")
+                task = asyncio.create_task(self.close(code=SLOW_CONSUMER_CLOSE_CODE))
+                _closing_tasks.add(task)
+                task.add_done_callback(_closing_tasks.discard)
+                return False
+            self._queue.popleft()
+        self._queue.append(frame)
+        self._ready.set()
+        return True
+
+    def __len__(self):
+        return len(self._queue)
+
+    async def _write_loop(self):
+        try:
+            while True:
+                while not self._queue:
+                    self._ready.clear()
+                    await self._ready.wait()
+                frame = self._queue.popleft()
+                await self.websocket.send_text(frame)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logging.warning(f"[{self.session_id}] Failed to send to a client: {e}")
+        finally:
+            self.closed = True
+            self._queue.clear()
+            if self.on_close:
+                self.on_close(self)
+
+    async def close(self, code: int = 1000):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            pass
+        if self._writer and self._writer is not asyncio.current_task():
+            self._writer.cancel()
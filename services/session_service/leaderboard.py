@@ -0,0 +1,64 @@
+# leaderboard.py
+from typing import Dict, List, Optional
+
+from sortedcontainers import SortedList
+
+
+class Leaderboard:
+    """
+    Live per-session ranking backed by an order-statistics list of (-score, user_id):
+     - update(): O(log n)
+     - rank_of(): O(log n), competition ranking (ties share a rank: 1, 2, 2, 4)
+     - top(k): O(log n + k)
+    diff_top() returns only what changed in the top k since the last call, so
+    clients receive small updates instead of the full table.
+    """
+
+    def __init__(self, top_k: int = 10):
+        self.top_k = top_k
+        self._ranked = SortedList()
+        self._scores: Dict[str, float] = {}
+        self._last_top: Dict[str, tuple] = {}  # user_id -> (rank, score) as last published
+
+    def __len__(self):
+        return len(self._scores)
+
+    def update(self, user_id: str, score: float):
+        old = self._scores.get(user_id)
+        if old == score:
+            return
+        if old is not None:
+            self._ranked.remove((-old, user_id))
+        self._scores[user_id] = score
+        self._ranked.add((-score, user_id))
+
+    def score_of(self, user_id: str) -> Optional[float]:
+        return self._scores.get(user_id)
+
+    def rank_of(self, user_id: str) -> Optional[int]:
+        score = self._scores.get(user_id)
+        if score is None:
+            return None
+        # Everyone with a strictly higher score sorts before (-score, "")
+        return self._ranked.bisect_left((-score, "")) + 1
+
+    def top(self, k: Optional[int] = None) -> List[dict]:
+        entries = []
+        rank = 0
+        for position, (neg_score, user_id) in enumerate(self._ranked.islice(0, k if k is not None else self.top_k), 1):
+            if not entries or entries[-1]["score"] != -neg_score:
+                rank = position
+            entries.append({"user_id": user_id, "score": -neg_score, "rank": rank})
+        return entries
+
+    def diff_top(self) -> dict:
+        """Changes to the top k since the previous diff_top() call."""
+        current = {entry["user_id"]: (entry["rank"], entry["score"]) for entry in self.top()}
+        changed = [
+            {"user_id": user_id, "rank": rank, "score": score}
+            for user_id, (rank, score) in current.items()
+            if self._last_top.get(user_id) != (rank, score)
+        ]
+        removed = [user_id for user_id in self._last_top if user_id not in current]
+        self._last_top = current
+        return {"changed": changed, "removed": removed}
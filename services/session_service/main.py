@@ -1,116 +1,340 @@
 # main.py
-import asyncio
+import json
 import logging
 import os
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from typing import Optional
+import httpx
+from fastapi import FastAPI, HTTPException, Query, WebSocket, WebSocketDisconnect
 from fastapi.responses import JSONResponse
-from session_manager import SessionManager
+from pydantic import BaseModel, Field
+import backend_client
+from bus import BroadcastBus
+from connection_registry import ConnectionRegistry
+from fanout import ClientConnection, DROP_OLDEST
+from replay import ReplayLog
+from scheduler import TimerScheduler
+from session_registry import SessionRegistry
 
 logging.basicConfig(level=logging.INFO, format="[%(asctime)s] [%(levelname)s] %(message)s", datefmt="%H:%M:%S")
 
 app = FastAPI(title="Session Service (WebSocket Stub)")
 
-# Simple in-memory mapping: session_id -> set of WebSocket connections
-# Protected by asyncio primitives
-_connection_lock = asyncio.Lock()
-_connections = {}  # session_id -> set(websocket)
+# Per-client send queue sizing and what to do when a client can't keep up
+SEND_QUEUE_SIZE = int(os.getenv("SEND_QUEUE_SIZE", "64"))
+SLOW_CONSUMER_POLICY = os.getenv("SLOW_CONSUMER_POLICY", DROP_OLDEST)
 
+# session_id -> connections; lock-free, see connection_registry.py
+connections = ConnectionRegistry()
 
-async def add_connection(session_id: str, ws: WebSocket):
-    async with _connection_lock:
-        conns = _connections.setdefault(session_id, set())
-        conns.add(ws)
-        logging.info(f"[{session_id}] New WS client connected. Total={len(conns)}")
+# Workers started by `uvicorn --workers N` find each other through Unix sockets in this
+# directory; only the master dispatches, the bus carries its frames to every worker.
+BUS_DIR = os.getenv("SESSION_BUS_DIR", os.path.join(".locks", "bus"))
+BUS_MAX_BUFFER = int(os.getenv("SESSION_BUS_MAX_BUFFER", str(4 * 1024 * 1024)))
+# How long a worker waits for the worker hosting a session's master to answer over the bus
+BUS_REQUEST_TIMEOUT = float(os.getenv("SESSION_BUS_REQUEST_TIMEOUT", "1.0"))
 
+# Recent broadcasts per session, replayed to clients reconnecting with ?last_seq=N
+REPLAY_BUFFER_SIZE = int(os.getenv("REPLAY_BUFFER_SIZE", "256"))
+REPLAY_MAX_SESSIONS = int(os.getenv("REPLAY_MAX_SESSIONS", "1000"))
+replay_log = ReplayLog(size=REPLAY_BUFFER_SIZE, max_sessions=REPLAY_MAX_SESSIONS)
 
-async def remove_connection(session_id: str, ws: WebSocket):
-    async with _connection_lock:
-        conns = _connections.get(session_id, set())
-        if ws in conns:
-            conns.remove(ws)
-            logging.info(f"[{session_id}] WS client disconnected. Total={len(conns)}")
-        if not conns:
-            _connections.pop(session_id, None)
 
+def add_connection(session_id: str, ws: WebSocket) -> ClientConnection:
+    conn = ClientConnection(
+        ws,
+        session_id,
+        max_queue=SEND_QUEUE_SIZE,
+        policy=SLOW_CONSUMER_POLICY,
+        on_close=lambda c: remove_connection(session_id, c),
+    )
+    total = connections.add(session_id, conn)
+    logging.info(f"[{session_id}] New WS client connected. Total={total}")
+    conn.start()
+    return conn
+
+
+def remove_connection(session_id: str, conn: ClientConnection):
+    if connections.remove(session_id, conn):
+        logging.info(f"[{session_id}] WS client disconnected. Total={connections.count(session_id)}")
 
-async def broadcast(session_id: str, message: dict):
+
+def deliver_local(session_id: str, frame: str):
     """
-    Send a JSON message to all connected websockets for the session.
-    If a websocket fails, we remove it.
+    Queue the same pre-serialized frame on every client of the session in this worker.
+    Each client's writer task does the actual send, so one slow socket never
+    delays the others; full queues are handled by SLOW_CONSUMER_POLICY.
     """
-    async with _connection_lock:
-        conns = list(_connections.get(session_id, set()))
+    conns = connections.snapshot(session_id)
     if not conns:
         logging.debug(f"[{session_id}] No clients to broadcast to.")
         return
-    to_remove = []
-    for ws in conns:
-        try:
-            await ws.send_json(message)
-        except Exception as e:
-            logging.warning(f"[{session_id}] Failed to send to a client: {e}")
-            to_remove.append(ws)
-    for ws in to_remove:
-        await remove_connection(session_id, ws)
+    for conn in conns:
+        conn.enqueue(frame)
+
+
+def deliver_relayed(session_id: str, frame: str):
+    """A frame another worker broadcast: keep it for replay, then fan out locally."""
+    replay_log.record(session_id, frame)
+    deliver_local(session_id, frame)
+
+
+async def handle_bus_request(body: dict) -> Optional[dict]:
+    """
+    Another worker's request about a session. Only the worker hosting the session's
+    master replies to answers and leaderboard reads, so the requester hears the
+    authoritative one; a delete is carried out (and acknowledged) by every worker
+    hosting the session, and every worker replies to a session listing.
+    """
+    op = body.get("op")
+    if op == "sessions":
+        return {"sessions": [manager.status() for manager in registry.list()]}
+    manager = registry.get(body.get("session_id"))
+    if manager is None:
+        return None
+    if op == "delete":
+        await registry.destroy(manager.session_id)
+        return {"deleted": True}
+    if not manager.is_master:
+        return None
+    if op == "answer":
+        return manager.submit_answer(body.get("user_id"), body.get("question_id"), body.get("answer"))
+    if op == "leaderboard" and manager.answers is not None:
+        return leaderboard_result(manager, body.get("k", 10), body.get("user_id"))
+    return None
+
+
+def master_key(session_id: str) -> str:
+    return f"master:{session_id}"
+
+
+def on_mastership(session_id: str, is_master: bool):
+    """Tell the other workers which sessions this worker is master of."""
+    bus.share(master_key(session_id), True if is_master else None)
+
+
+def on_shared_change(key: str):
+    """A master went away (released or its worker exited): let a local standby take over at once."""
+    if not key.startswith("master:") or bus.shared(key):
+        return
+    manager = registry.get(key[len("master:"):])
+    if manager is not None:
+        manager.master_released()
+
+
+bus = BroadcastBus(BUS_DIR, deliver=deliver_relayed, max_buffer=BUS_MAX_BUFFER,
+                   handle_request=handle_bus_request, on_shared_change=on_shared_change)
+
+
+async def broadcast(session_id: str, message):
+    """
+    Serialize the message once (question frames arrive already encoded), number it
+    for replay, hand it to the other workers, then fan out locally.
+    """
+    frame = message if isinstance(message, str) else json.dumps(message)
+    frame = replay_log.stamp(session_id, frame)
+    bus.publish(session_id, frame)
+    deliver_local(session_id, frame)
+
+
+def replay_missed(conn: ClientConnection, session_id: str, last_seq: int, epoch: Optional[str]):
+    """
+    Queue the broadcasts a reconnecting client missed, ahead of any live frame.
+    If they are no longer all buffered, were numbered in another epoch (or would
+    overflow the client's queue), send a replay_gap instead so the client refetches
+    state over HTTP and continues from the seq/epoch given there.
+    """
+    missed, current, current_epoch = replay_log.since(session_id, last_seq, epoch)
+    if missed is None or len(missed) >= conn.max_queue:
+        conn.enqueue(json.dumps({
+            "type": "replay_gap", "session_id": session_id, "last_seq": current, "epoch": current_epoch,
+        }))
+        return
+    for frame in missed:
+        conn.enqueue(frame)
+
+
+async def submit_answer(session_id: str, user_id, question_id, answer) -> dict:
+    """
+    Score an answer on the master. Clients can be connected to any worker, so when
+    the master isn't hosted here the answer is forwarded over the bus and the
+    master's verdict comes back; no master anywhere means an explicit rejection.
+    """
+    manager = registry.get(session_id)
+    if manager is not None and manager.is_master:
+        return manager.submit_answer(user_id, question_id, answer)
+    result = await bus.request(
+        {"op": "answer", "session_id": session_id, "user_id": user_id, "question_id": question_id, "answer": answer},
+        timeout=BUS_REQUEST_TIMEOUT,
+    )
+    if result is not None:
+        return result
+    if manager is not None:
+        return manager.submit_answer(user_id, question_id, answer)
+    return {"accepted": False, "reason": "unknown session"}
 
 
 @app.websocket("/ws/{session_id}")
-async def ws_endpoint(websocket: WebSocket, session_id: str):
+async def ws_endpoint(websocket: WebSocket, session_id: str, user_id: Optional[str] = None,
+                      last_seq: Optional[int] = Query(None, ge=0), epoch: Optional[str] = None):
     """
-    Clients connect here to receive questions and send answers.
-    Messages from client are forwarded to the console as a simple demo.
+    Clients connect here (optionally as /ws/{session_id}?user_id=...) to receive questions
+    and send answers: {"type": "answer", "question_id", "answer", "answer_id"}.
+    Answers are validated and scored server-side by the session's master, whichever
+    worker hosts it; every answer gets an ack with "accepted" (and a "reason" if not).
+    Broadcast frames carry a "seq" and an "epoch"; reconnecting with
+    ?last_seq=<last seq seen>&epoch=<its epoch> replays the frames missed in between
+    before live ones.
     """
     await websocket.accept()
-    await add_connection(session_id, websocket)
+    conn = add_connection(session_id, websocket)
+    if last_seq is not None:
+        # No await since add_connection: no broadcast can slip in between or ahead of the replay
+        replay_missed(conn, session_id, last_seq, epoch)
     try:
         while True:
-            data = await websocket.receive_json()
-            # For the stub: just log incoming client messages (answers)
-            logging.info(f"[{session_id}] Received from client: {data}")
-            # echo ack back
-            await websocket.send_json({"type": "ack", "answer_id": data.get("answer_id")})
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            raw = message.get("text") if message.get("text") is not None else message.get("bytes")
+            logging.debug(f"[{session_id}] Received from client: {raw!r}")
+            try:
+                data = json.loads(raw)
+            except (TypeError, ValueError):
+                data = None
+            if not isinstance(data, dict):
+                conn.enqueue(json.dumps({"type": "ack", "accepted": False, "reason": "malformed frame"}))
+                continue
+            ack = {"type": "ack", "answer_id": data.get("answer_id")}
+            ack.update(await submit_answer(
+                session_id,
+                data.get("user_id") or user_id,
+                data.get("question_id"),
+                data.get("answer"),
+            ))
+            # ack goes through the client's queue so it never races a broadcast send
+            conn.enqueue(json.dumps(ack))
     except WebSocketDisconnect:
         logging.info(f"[{session_id}] Client disconnected.")
     finally:
-        await remove_connection(session_id, websocket)
+        await conn.close()
+        remove_connection(session_id, conn)
 
 
-# Create a single SessionManager per session you want to demo.
-# For a minimal demo, we'll use one session id; you can create more.
+# All sessions hosted by this process share one timer scheduler and one registry.
+# The demo session is still created at startup unless DEMO_SESSION_ID is set to "".
 SESSION_ID = os.getenv("DEMO_SESSION_ID", "session-101")
 QUESTION_INTERVAL = float(os.getenv("QUESTION_INTERVAL", "6.0"))
 
-session_manager: SessionManager = None
+scheduler = TimerScheduler()
+registry = SessionRegistry(scheduler=scheduler, broadcaster=broadcast, on_mastership=on_mastership)
+
+
+class SessionCreate(BaseModel):
+    session_id: str
+    question_interval: float = Field(QUESTION_INTERVAL, gt=0)
+    total_questions: Optional[int] = Field(None, gt=0)
+    quiz_id: Optional[str] = None
+    restart: bool = False  # discard any checkpoint left by a previous run of this session id
 
 
 @app.on_event("startup")
 async def startup_event():
-    global session_manager
     logging.info("Starting session service (WebSocket stub)...")
-    session_manager = SessionManager(
-        session_id=SESSION_ID,
-        question_interval=QUESTION_INTERVAL,
-        broadcaster=broadcast
-    )
-    # run the manager as a background task
-    asyncio.create_task(session_manager.run())
+    scheduler.start()
+    await bus.start()
+    await backend_client.open_client()
+    if SESSION_ID:
+        await registry.create(SESSION_ID, question_interval=QUESTION_INTERVAL)
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
-    global session_manager
-    if session_manager:
-        await session_manager.shutdown()
+    await registry.shutdown_all()
+    await scheduler.stop()
+    await bus.stop()
+    await backend_client.close_client()
     logging.info("Session service shutting down.")
 
 
 @app.get("/")
 async def root():
-    return JSONResponse({"msg": "session service (ws) up", "session": SESSION_ID})
+    return JSONResponse({"msg": "session service (ws) up", "session": SESSION_ID, "sessions": len(registry)})
+
+
+@app.post("/sessions", status_code=201)
+async def create_session(session: SessionCreate):
+    try:
+        manager = await registry.create(
+            session.session_id,
+            question_interval=session.question_interval,
+            total_questions=session.total_questions,
+            quiz_id=session.quiz_id,
+            restart=session.restart,
+        )
+    except KeyError:
+        raise HTTPException(status_code=409, detail="Session already exists")
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(status_code=e.response.status_code, detail="Could not load quiz from API service")
+    except httpx.RequestError:
+        raise HTTPException(status_code=503, detail="API service is unavailable")
+    return manager.status()
+
+
+@app.get("/sessions")
+async def list_sessions():
+    """Sessions hosted by any worker; where several host one, the master's status is shown."""
+    statuses = [manager.status() for manager in registry.list()]
+    for reply in await bus.gather({"op": "sessions"}, timeout=BUS_REQUEST_TIMEOUT):
+        statuses.extend(reply.get("sessions", []))
+    merged = {}
+    for status in statuses:
+        if status["session"] not in merged or status["is_master"]:
+            merged[status["session"]] = status
+    return list(merged.values())
+
+
+@app.delete("/sessions/{session_id}")
+async def delete_session(session_id: str):
+    # Other workers may host the session (or its master) too
+    deleted_here = await registry.destroy(session_id)
+    deleted_elsewhere = await bus.request({"op": "delete", "session_id": session_id}, timeout=BUS_REQUEST_TIMEOUT)
+    if not deleted_here and deleted_elsewhere is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return {"session": session_id, "deleted": True}
+
+
+def leaderboard_result(manager, k: int, user_id: Optional[str]) -> dict:
+    leaderboard = manager.answers.leaderboard
+    result = {"session": manager.session_id, "participants": len(leaderboard), "top": leaderboard.top(k)}
+    if user_id is not None:
+        result["user"] = {"user_id": user_id, "rank": leaderboard.rank_of(user_id), "score": leaderboard.score_of(user_id)}
+    return result
+
+
+@app.get("/sessions/{session_id}/leaderboard")
+async def read_leaderboard(session_id: str, k: int = 10, user_id: Optional[str] = None):
+    """The master keeps the scores; when it is hosted by another worker, its leaderboard is fetched over the bus."""
+    manager = registry.get(session_id)
+    if manager is not None and manager.is_master and manager.answers is not None:
+        return leaderboard_result(manager, k, user_id)
+    if bus.shared(master_key(session_id)):
+        result = await bus.request(
+            {"op": "leaderboard", "session_id": session_id, "k": k, "user_id": user_id},
+            timeout=BUS_REQUEST_TIMEOUT,
+        )
+        if result is not None:
+            return result
+    if manager is None or manager.answers is None:
+        raise HTTPException(status_code=404, detail="No leaderboard for this session")
+    return leaderboard_result(manager, k, user_id)
 
 
 @app.get("/status/{session_id}")
 async def status(session_id: str):
-    async with _connection_lock:
-        clients = len(_connections.get(session_id, set()))
-    return {"session": session_id, "clients": clients, "is_master": session_manager.is_master if session_manager else False}
+    manager = registry.get(session_id)
+    is_master = manager.is_master if manager else False
+    # clients and is_master describe this worker; master_running covers every worker,
+    # from the masterships the other workers share over the bus
+    master_running = is_master or bool(bus.shared(master_key(session_id)))
+    return {"session": session_id, "clients": connections.count(session_id), "is_master": is_master,
+            "master_running": master_running}
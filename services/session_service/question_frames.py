@@ -0,0 +1,52 @@
+# question_frames.py
+import json
+import random
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class QuestionFrames:
+    """
+    Every question of a session's quiz, encoded once when the session is created.
+
+    Each question becomes a JSON prefix with everything that never changes during the
+    session: ids, text, numbering and the options, with their order shuffled once for
+    this session. Correct answers are never part of it. Dispatching question n
+    only appends the per-dispatch fields (timestamp, deadline, fencing token) to
+    prefix n, so there is no lookup into the quiz and no json.dumps of the question.
+
+    The shuffle is seeded from the session id, so every worker and every later master
+    of the same session sends the options in the same order.
+    """
+
+    def __init__(self, session_id: str, quiz: Dict[str, Any], question_interval: float):
+        questions = quiz.get("questions", [])
+        rng = random.Random(f"{session_id}:{quiz.get('id')}")
+        self.question_ids: List[str] = []
+        self._prefixes: List[str] = []
+        for number, question in enumerate(questions, start=1):
+            options = list((question.get("options") or {}).items())
+            rng.shuffle(options)
+            static = {
+                "type": "question",
+                "session_id": session_id,
+                "question_id": question["id"],
+                "text": question["question_text"],
+                "options": dict(options),
+                "number": number,
+                "total": len(questions),
+                "duration_seconds": question_interval,
+            }
+            # Drop the closing brace; render() appends the dynamic fields and closes it
+            self._prefixes.append(json.dumps(static)[:-1])
+            self.question_ids.append(question["id"])
+
+    def __len__(self) -> int:
+        return len(self._prefixes)
+
+    def render(self, number: int, timestamp: float, deadline: float,
+               fencing_token: Optional[int] = None) -> Tuple[str, str]:
+        """(question_id, frame) for 1-based question `number`; same JSON as json.dumps of the payload dict."""
+        tail = f', "timestamp": {timestamp!r}, "deadline": {deadline!r}'
+        if fencing_token is not None:
+            tail += f', "fencing_token": {fencing_token}'
+        return self.question_ids[number - 1], f"{self._prefixes[number - 1]}{tail}}}"
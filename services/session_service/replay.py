@@ -0,0 +1,108 @@
+# replay.py
+import re
+import uuid
+from collections import OrderedDict, deque
+from typing import List, Optional, Tuple
+
+_SEQ_PREFIX = re.compile(r'\{"seq": (\d+), "epoch": "([0-9a-f]+)"')
+
+
+def new_epoch() -> str:
+    return uuid.uuid4().hex[:12]
+
+
+class ReplayBuffer:
+    """The last `size` broadcast frames of one session, with their sequence numbers."""
+
+    __slots__ = ("frames", "last_seq", "epoch")
+
+    def __init__(self, size: int):
+        self.frames: deque = deque(maxlen=size)  # (seq, frame), oldest first
+        self.last_seq = 0
+        self.epoch: Optional[str] = None  # numbering lineage the sequence numbers belong to
+
+    def append(self, seq: int, frame: str):
+        self.frames.append((seq, frame))
+        self.last_seq = seq
+
+    def since(self, last_seen: int, epoch: Optional[str]) -> Optional[List[str]]:
+        """Frames after `last_seen`, or None if some of them are no longer buffered."""
+        if last_seen < 0 or last_seen > self.last_seq:
+            return None
+        if last_seen > 0 and epoch != self.epoch:
+            return None  # numbers from another lineage (e.g. before a restart) mean nothing here
+        if last_seen == self.last_seq:
+            return []
+        if not self.frames or self.frames[0][0] > last_seen + 1:
+            return None
+        # Sequence numbers are contiguous, so the first missed frame is at a known offset
+        start = last_seen + 1 - self.frames[0][0]
+        return [frame for _, frame in list(self.frames)[start:]]
+
+
+class ReplayLog:
+    """
+    Per-session ring buffers of recent broadcasts, so a client that reconnects with
+    the last sequence number it saw gets exactly the frames it missed.
+
+    Sequence numbers are assigned where a broadcast originates (stamp) and travel
+    inside the frame, as its first fields, so every worker, fed by the broadcast bus,
+    records the same numbers and a client may reconnect to any of them. A worker
+    that takes over as master continues from the last number it has seen.
+
+    Numbering that starts from scratch (a fresh process, or a session evicted from
+    this log) gets a new random epoch, sent with every frame next to its seq. A client
+    reconnects with both; a seq from another epoch is never matched against this one.
+
+    Bounded twice: `size` frames per session and `max_sessions` sessions, evicting the
+    session that broadcast least recently.
+    """
+
+    def __init__(self, size: int = 256, max_sessions: int = 1000):
+        self.size = size
+        self.max_sessions = max_sessions
+        self._buffers: OrderedDict[str, ReplayBuffer] = OrderedDict()
+
+    def _buffer(self, session_id: str) -> ReplayBuffer:
+        buffer = self._buffers.get(session_id)
+        if buffer is None:
+            buffer = self._buffers[session_id] = ReplayBuffer(self.size)
+            while len(self._buffers) > self.max_sessions:
+                self._buffers.popitem(last=False)
+        else:
+            self._buffers.move_to_end(session_id)
+        return buffer
+
+    def stamp(self, session_id: str, frame: str) -> str:
+        """Number a locally originated JSON object frame, record it and return the numbered frame."""
+        buffer = self._buffer(session_id)
+        if buffer.epoch is None:
+            buffer.epoch = new_epoch()
+        seq = buffer.last_seq + 1
+        rest = frame[1:]
+        head = f'{{"seq": {seq}, "epoch": "{buffer.epoch}"'
+        frame = f"{head}, {rest}" if rest != "}" else f"{head}}}"
+        buffer.append(seq, frame)
+        return frame
+
+    def record(self, session_id: str, frame: str):
+        """Record a frame numbered by another worker (received over the bus)."""
+        match = _SEQ_PREFIX.match(frame)
+        if match is None:
+            return
+        seq, epoch = int(match.group(1)), match.group(2)
+        buffer = self._buffer(session_id)
+        if epoch != buffer.epoch or seq != buffer.last_seq + 1:
+            # Numbering restarted (the originating worker restarted) or the bus dropped
+            # frames: nothing before this one can be replayed without a hole
+            buffer.frames.clear()
+            buffer.epoch = epoch
+        buffer.append(seq, frame)
+
+    def since(self, session_id: str, last_seen: int,
+              epoch: Optional[str] = None) -> Tuple[Optional[List[str]], int, Optional[str]]:
+        """(missed frames or None if they can't all be replayed, current last sequence, current epoch)"""
+        buffer = self._buffers.get(session_id)
+        if buffer is None:
+            return (None if last_seen != 0 else []), 0, None
+        return buffer.since(last_seen, epoch), buffer.last_seq, buffer.epoch
@@ -0,0 +1,111 @@
+# scheduler.py
+import asyncio
+import heapq
+import inspect
+import itertools
+import logging
+from typing import Callable, Optional
+
+logging.basicConfig(level=logging.INFO, format="[%(asctime)s] [%(levelname)s] %(message)s", datefmt="%H:%M:%S")
+
+
+class TimerHandle:
+    """Returned by TimerScheduler.call_at / call_later. Cancellation is lazy (O(1))."""
+
+    __slots__ = ("when", "callback", "args", "cancelled")
+
+    def __init__(self, when: float, callback: Callable, args: tuple):
+        self.when = when
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class TimerScheduler:
+    """
+    One asyncio task that drives every timer in the process from a min-heap:
+     - Sleeps exactly until the earliest deadline (no fixed polling interval)
+     - Deadlines are absolute loop.time() values, so repeating timers don't drift
+     - Coroutine callbacks run as their own tasks so a slow session can't delay the others
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._counter = itertools.count()  # tie-breaker so equal deadlines never compare handles
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._callback_tasks = set()
+
+    def time(self) -> float:
+        return asyncio.get_running_loop().time()
+
+    def start(self):
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for task in list(self._callback_tasks):
+            task.cancel()
+        self._heap.clear()
+
+    def call_at(self, when: float, callback: Callable, *args) -> TimerHandle:
+        handle = TimerHandle(when, callback, args)
+        earliest = self._heap[0][0] if self._heap else None
+        heapq.heappush(self._heap, (when, next(self._counter), handle))
+        if self._wakeup and (earliest is None or when < earliest):
+            self._wakeup.set()
+        return handle
+
+    def call_later(self, delay: float, callback: Callable, *args) -> TimerHandle:
+        return self.call_at(self.time() + delay, callback, *args)
+
+    def __len__(self):
+        return len(self._heap)
+
+    async def _run(self):
+        while True:
+            # Drop cancelled timers sitting at the top of the heap
+            while self._heap and self._heap[0][2].cancelled:
+                heapq.heappop(self._heap)
+            self._wakeup.clear()
+            if not self._heap:
+                await self._wakeup.wait()
+                continue
+            delay = self._heap[0][0] - self.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            now = self.time()
+            while self._heap and self._heap[0][0] <= now:
+                _, _, handle = heapq.heappop(self._heap)
+                if not handle.cancelled:
+                    self._fire(handle)
+
+    def _fire(self, handle: TimerHandle):
+        try:
+            result = handle.callback(*handle.args)
+        except Exception as e:
+            logging.error(f"Timer callback {handle.callback!r} failed: {e}")
+            return
+        if inspect.isawaitable(result):
+            task = asyncio.ensure_future(result)
+            self._callback_tasks.add(task)
+            task.add_done_callback(self._callback_done)
+
+    def _callback_done(self, task: asyncio.Task):
+        self._callback_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logging.error(f"Timer callback task failed: {task.exception()}")
@@ -1,97 +1,305 @@
 # session_manager.py
 import asyncio
+import json
 import logging
 import time
-import os
-from typing import Callable, Optional
+from typing import Callable, Optional, Tuple
 
-from coordinator import FileLockCoordinator
+from answers import AnswerPipeline
+from checkpoint import CheckpointLog
+from coordinator import make_coordinator
+from question_frames import QuestionFrames
+from scheduler import TimerHandle, TimerScheduler
 
 logging.basicConfig(level=logging.INFO, format="[%(asctime)s] [%(levelname)s] %(message)s", datefmt="%H:%M:%S")
 
 
 class SessionManager:
     """
-    Async session manager that:
+    Event-driven session manager that:
      - Tries to acquire a session-level lock (coordinator)
-     - If master, dispatches questions periodically via the provided broadcaster callback
-     - If not master, keeps retrying to acquire lock
+     - If master, dispatches questions on absolute deadlines kept by the shared TimerScheduler
+     - If not master, schedules another lock attempt after coordinator.retry_delay()
+     - With a lease coordinator, renews the lease on a heartbeat timer and steps down if it is lost
+     - Checkpoints every transition, so a new master resumes mid-question instead of replaying the quiz
+     - Reports mastership changes to on_mastership, and retries at once when told (master_released)
+       that another worker gave the session up
+    No per-session task or polling loop: every wake-up is a single timer in the scheduler heap.
     """
 
-    def __init__(self, session_id: str, question_interval: float = 6.0, broadcaster: Optional[Callable] = None):
+    def __init__(
+        self,
+        session_id: str,
+        question_interval: float = 6.0,
+        broadcaster: Optional[Callable] = None,
+        scheduler: Optional[TimerScheduler] = None,
+        total_questions: Optional[int] = None,
+        retry_interval: float = 3.0,
+        quiz: Optional[dict] = None,
+        answers: Optional[AnswerPipeline] = None,
+        coordinator=None,
+        on_mastership: Optional[Callable[[str, bool], None]] = None,
+    ):
         self.session_id = session_id
-        self.coordinator = FileLockCoordinator(session_id)
+        self.coordinator = make_coordinator(session_id, retry_interval=retry_interval) if coordinator is None else coordinator
         self.question_interval = question_interval
-        self.broadcaster = broadcaster  # async function: await broadcaster(session_id, message_dict)
+        self.broadcaster = broadcaster  # async function: await broadcaster(session_id, message_dict or frame)
+        self.scheduler = scheduler
+        self.quiz_id = quiz["id"] if quiz is not None else None
+        # Quiz loaded from api_service, pre-encoded without answers; None -> demo questions
+        self.frames = QuestionFrames(session_id, quiz, question_interval) if quiz is not None else None
+        self.answers = answers  # server-side scoring, only when a quiz is loaded
+        if self.frames is not None:
+            total_questions = len(self.frames)
+        self.total_questions = total_questions  # None -> keep dispatching until shutdown
+        self.retry_interval = retry_interval
+        self.on_mastership = on_mastership  # callable(session_id, is_master) on every change
         self.is_master = False
-        self._task = None
+        self.finished = False
+        self.current_question = 0
+        self.open_question_id: Optional[str] = None
+        self.question_deadline: Optional[float] = None  # epoch seconds, for checkpoints and clients
+        self.checkpoint = CheckpointLog(session_id)
+        self._next_deadline: Optional[float] = None
+        self._timer: Optional[TimerHandle] = None
+        self._heartbeat: Optional[TimerHandle] = None
         self._running = False
+        self._acquiring = False
 
-    async def run(self):
+    def _set_master(self, is_master: bool):
+        if is_master == self.is_master:
+            return
+        self.is_master = is_master
+        if self.on_mastership:
+            self.on_mastership(self.session_id, is_master)
+
+    def master_released(self):
+        """Another worker stopped being master of this session: try to take over now."""
+        if not self._running or self.is_master or self._acquiring:
+            return
+        if self._timer:
+            self._timer.cancel()
+        self._timer = self.scheduler.call_later(0, self._try_become_master)
+
+    def start(self):
+        """Schedule the first lock attempt on the shared scheduler."""
+        logging.info(f"[{self.session_id}] SessionManager starting (scheduled).")
+        self._running = True
+        self._timer = self.scheduler.call_later(0, self._try_become_master)
+
+    async def _try_become_master(self):
+        if not self._running:
+            return
+        self._acquiring = True
+        try:
+            # Lock files may block (lease guard flock): keep them off the event loop
+            acquired = await asyncio.to_thread(self.coordinator.try_acquire_lock)
+        except Exception as e:
+            logging.error(f"[{self.session_id}] Unexpected error acquiring lock: {e}")
+            acquired = False
+        finally:
+            self._acquiring = False
+        if not self._running:
+            # Shut down while we were acquiring
+            if acquired:
+                await asyncio.to_thread(self.coordinator.release_lock)
+            return
+        if acquired:
+            self._set_master(True)
+            logging.info(f"[{self.session_id}] Became master. Starting dispatch.")
+            self._timer = self.scheduler.call_later(0, self._resume)
+            if self.coordinator.heartbeat_interval:
+                self._heartbeat = self.scheduler.call_later(self.coordinator.heartbeat_interval, self._renew_lease)
+        else:
+            self._set_master(False)
+            delay = self.coordinator.retry_delay()
+            logging.debug(f"[{self.session_id}] Not master. Will retry in {delay:.2f}s.")
+            self._timer = self.scheduler.call_later(delay, self._try_become_master)
+
+    async def _renew_lease(self):
+        """Heartbeat for lease-based coordinators. Losing the lease demotes us to standby."""
+        self._heartbeat = None
+        if not self._running or not self.is_master:
+            return
+        renewed = await asyncio.to_thread(self.coordinator.renew)
+        if not self._running or not self.is_master:
+            return
+        if renewed:
+            self._heartbeat = self.scheduler.call_later(self.coordinator.heartbeat_interval, self._renew_lease)
+            return
+        logging.warning(f"[{self.session_id}] Lost mastership; stopping dispatch.")
+        self._set_master(False)
+        self.open_question_id = None
+        if self._timer:
+            self._timer.cancel()
+        self._timer = self.scheduler.call_later(self.coordinator.retry_delay(), self._try_become_master)
+
+    async def _resume(self):
+        """Continue from the last checkpoint (if any) instead of starting again at question 1."""
+        if not self._running or not self.is_master:
+            return
+        state = self.checkpoint.load()
+        if state is None or (state["question"] == 0 and not state["finished"]):
+            self._next_deadline = self.scheduler.time()
+            self._timer = self.scheduler.call_at(self._next_deadline, self._dispatch_next)
+            return
+        self.current_question = state["question"]
+        if self.answers:
+            self.answers.restore(state["participants"])
+        if state["finished"]:
+            logging.info(f"[{self.session_id}] Checkpoint says session already finished.")
+            self.finished = True
+            await self.shutdown()
+            return
+        remaining = max(0.0, (state["deadline"] or 0.0) - time.time())
+        logging.info(f"[{self.session_id}] Resuming at question {self.current_question} ({remaining:.2f}s left).")
+        self._next_deadline = self.scheduler.time() + remaining
+        self._timer = self.scheduler.call_at(self._next_deadline, self._dispatch_next)
+        if remaining > 0:
+            # Re-announce the open question so clients of the new master can still answer it
+            self.question_deadline = state["deadline"]
+            self.open_question_id, frame = self._question_frame(self.current_question, self.question_deadline)
+            if self.broadcaster:
+                await self.broadcaster(self.session_id, frame)
+
+    def _checkpoint_state(self) -> dict:
+        return {
+            "question": self.current_question,
+            "question_id": self.open_question_id,
+            "deadline": self.question_deadline,
+            "participants": {
+                user_id: participant.answers for user_id, participant in self.answers.participants.items()
+            } if self.answers else {},
+            "finished": self.finished,
+        }
+
+    def _question_frame(self, number: int, deadline: float) -> Tuple[str, str]:
+        """(question_id, serialized frame) for question `number`."""
+        now = time.time()
+        # The fencing token lets receivers discard frames from a master that has since been replaced
+        if self.frames is not None:
+            return self.frames.render(number, now, deadline, self.coordinator.fencing_token)
+        question_payload = {
+            "type": "question",
+            "session_id": self.session_id,
+            "question_id": f"q{number}",
+            "text": f"Demo question #{number}",
+            "timestamp": now,
+            "duration_seconds": self.question_interval,
+            "deadline": deadline,
+        }
+        if self.coordinator.fencing_token is not None:
+            question_payload["fencing_token"] = self.coordinator.fencing_token
+        return question_payload["question_id"], json.dumps(question_payload)
+
+    async def _dispatch_next(self):
         """
-        Main entrypoint — keeps running until shutdown is called.
-        It attempts to acquire the coordinator lock. When master, it runs the dispatch loop.
+        Send the next question and arm the timer for its deadline.
+        The next deadline is derived from the previous one, not from "now",
+        so broadcast time never accumulates as drift.
         """
-        logging.info(f"[{self.session_id}] SessionManager starting (async).")
-        while True:
+        if not self._running or not self.is_master:
+            return
+        if self.total_questions is not None and self.current_question >= self.total_questions:
+            await self._finish()
+            return
+        closed_question_id, self.open_question_id = self.open_question_id, None
+        await self._publish_leaderboard(closed_question_id)
+        self.current_question += 1
+        self._next_deadline += self.question_interval
+        self._timer = self.scheduler.call_at(self._next_deadline, self._dispatch_next)
+
+        self.question_deadline = time.time() + (self._next_deadline - self.scheduler.time())
+        self.open_question_id, frame = self._question_frame(self.current_question, self.question_deadline)
+        token = self.coordinator.fencing_token
+        self.checkpoint.append({
+            "t": "question",
+            "n": self.current_question,
+            "question_id": self.open_question_id,
+            "deadline": self.question_deadline,
+            "token": token,
+        })
+        self.checkpoint.maybe_compact(self._checkpoint_state, token)
+        logging.info(f"[{self.session_id}] Dispatching question: {self.open_question_id}")
+        if self.broadcaster:
             try:
-                acquired = self.coordinator.try_acquire_lock()
-                if acquired:
-                    self.is_master = True
-                    logging.info(f"[{self.session_id}] Became master. Starting dispatch loop.")
-                    self._running = True
-                    await self._dispatch_loop()
-                    # dispatch loop exited (likely due to shutdown) -> attempt release
-                    self.coordinator.release_lock()
-                    self.is_master = False
-                    logging.info(f"[{self.session_id}] Released lock and will retry acquiring again shortly.")
-                else:
-                    self.is_master = False
-                    logging.info(f"[{self.session_id}] Not master. Will retry in 3s.")
-                    await asyncio.sleep(3.0)
+                await self.broadcaster(self.session_id, frame)
             except Exception as e:
-                logging.error(f"[{self.session_id}] Unexpected error in manager.run: {e}")
-                await asyncio.sleep(3.0)
+                logging.error(f"[{self.session_id}] Error broadcasting question: {e}")
 
-    async def _dispatch_loop(self):
-        """
-        Async dispatch loop: create a question payload and use broadcaster to send it to clients.
-        If no broadcaster is provided, logs only.
-        """
-        qnum = 1
-        try:
-            while self._running:
-                question_payload = {
-                    "type": "question",
-                    "session_id": self.session_id,
-                    "question_id": f"q{qnum}",
-                    "text": f"Demo question #{qnum}",
-                    "timestamp": time.time(),
-                    "duration_seconds": self.question_interval
-                }
-                logging.info(f"[{self.session_id}] Dispatching question: {question_payload['question_id']}")
-                if self.broadcaster:
-                    # broadcaster is an async function (session_service.main.broadcast)
-                    await self.broadcaster(self.session_id, question_payload)
-                qnum += 1
-                # Wait question_interval seconds but check _running periodically
-                total = 0.0
-                interval = 0.5
-                while total < self.question_interval and self._running:
-                    await asyncio.sleep(interval)
-                    total += interval
-        except asyncio.CancelledError:
-            logging.info(f"[{self.session_id}] Dispatch loop cancelled.")
-        except Exception as e:
-            logging.error(f"[{self.session_id}] Error in dispatch loop: {e}")
+    async def _publish_leaderboard(self, closed_question_id: Optional[str]):
+        """After a question closes, push only the top-k entries that changed."""
+        if self.answers is None or closed_question_id is None or not self.broadcaster:
+            return
+        leaderboard = self.answers.leaderboard
+        diff = leaderboard.diff_top()
+        if not diff["changed"] and not diff["removed"]:
+            return
+        await self.broadcaster(self.session_id, {
+            "type": "leaderboard",
+            "session_id": self.session_id,
+            "after_question_id": closed_question_id,
+            "participants": len(leaderboard),
+            **diff,
+        })
+
+    def submit_answer(self, user_id: str, question_id: str, answer: str) -> dict:
+        if self.answers is None:
+            return {"accepted": False, "reason": "session has no answer key"}
+        if not self.is_master:
+            return {"accepted": False, "reason": "not accepting answers"}
+        result = self.answers.submit(user_id, question_id, answer, self.open_question_id)
+        if result["accepted"]:
+            self.checkpoint.append({
+                "t": "answer", "user": user_id, "q": question_id, "a": answer,
+                "token": self.coordinator.fencing_token,
+            })
+        return result
+
+    async def _finish(self):
+        logging.info(f"[{self.session_id}] All {self.total_questions} questions dispatched.")
+        self.finished = True
+        closed_question_id, self.open_question_id = self.open_question_id, None
+        self.question_deadline = None
+        self.checkpoint.compact(self._checkpoint_state(), self.coordinator.fencing_token)
+        await self._publish_leaderboard(closed_question_id)
+        if self.broadcaster:
+            await self.broadcaster(self.session_id, {"type": "session_ended", "session_id": self.session_id})
+        if self.answers:
+            await self.answers.finalize()
+        await self.shutdown()
+
+    def status(self) -> dict:
+        return {
+            "session": self.session_id,
+            "is_master": self.is_master,
+            "fencing_token": self.coordinator.fencing_token,
+            "current_question": self.current_question,
+            "total_questions": self.total_questions,
+            "question_interval": self.question_interval,
+            "quiz_id": self.quiz_id,
+            "participants": len(self.answers.participants) if self.answers else 0,
+            "finished": self.finished,
+        }
 
     async def shutdown(self):
         logging.info(f"[{self.session_id}] Shutdown requested for SessionManager.")
         self._running = False
+        self.open_question_id = None
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        if self._heartbeat:
+            self._heartbeat.cancel()
+            self._heartbeat = None
+        if self.answers and not self.finished:
+            await self.answers.flush()
+        self.checkpoint.close()
         # release lock if we hold it
         if self.is_master:
             try:
-                self.coordinator.release_lock()
+                await asyncio.to_thread(self.coordinator.release_lock)
             except Exception:
                 pass
+            self._set_master(False)
         logging.info(f"[{self.session_id}] Shutdown complete.")
@@ -0,0 +1,85 @@
+# session_registry.py
+import logging
+from typing import Callable, Dict, List, Optional
+
+import backend_client
+from answers import AnswerPipeline, build_answer_key
+from scheduler import TimerScheduler
+from session_manager import SessionManager
+
+logging.basicConfig(level=logging.INFO, format="[%(asctime)s] [%(levelname)s] %(message)s", datefmt="%H:%M:%S")
+
+
+class SessionRegistry:
+    """
+    Owns every SessionManager hosted by this process.
+    All managers share one TimerScheduler and one broadcaster, so hosting
+    thousands of sessions costs heap entries, not tasks.
+    """
+
+    def __init__(self, scheduler: TimerScheduler, broadcaster: Optional[Callable] = None,
+                 on_mastership: Optional[Callable[[str, bool], None]] = None):
+        self.scheduler = scheduler
+        self.broadcaster = broadcaster
+        self.on_mastership = on_mastership  # passed to every SessionManager
+        self._sessions: Dict[str, SessionManager] = {}
+
+    async def create(self, session_id: str, question_interval: float = 6.0,
+                     total_questions: Optional[int] = None, quiz_id: Optional[str] = None,
+                     restart: bool = False) -> SessionManager:
+        """
+        Register and start a session. With quiz_id, the quiz is loaded from api_service
+        once, up front, and its correct answers become the in-memory answer key.
+        A session resumes from its checkpoint log unless restart is set.
+        """
+        if session_id in self._sessions:
+            raise KeyError(f"Session {session_id} already exists.")
+        quiz = answers = None
+        if quiz_id is not None:
+            quiz = await backend_client.fetch_quiz(quiz_id)
+            if session_id in self._sessions:
+                raise KeyError(f"Session {session_id} already exists.")
+            answers = AnswerPipeline(
+                session_id=session_id,
+                quiz_id=quiz_id,
+                answer_key=build_answer_key(quiz),
+                scheduler=self.scheduler,
+                persist=lambda events, durable: backend_client.post_events(events, durable=durable),
+            )
+        manager = SessionManager(
+            session_id=session_id,
+            question_interval=question_interval,
+            broadcaster=self.broadcaster,
+            scheduler=self.scheduler,
+            total_questions=total_questions,
+            quiz=quiz,
+            answers=answers,
+            on_mastership=self.on_mastership,
+        )
+        if restart:
+            manager.checkpoint.clear()
+        self._sessions[session_id] = manager
+        manager.start()
+        logging.info(f"[{session_id}] Session registered. Hosted sessions={len(self._sessions)}")
+        return manager
+
+    async def destroy(self, session_id: str) -> bool:
+        manager = self._sessions.pop(session_id, None)
+        if manager is None:
+            return False
+        await manager.shutdown()
+        logging.info(f"[{session_id}] Session removed. Hosted sessions={len(self._sessions)}")
+        return True
+
+    def get(self, session_id: str) -> Optional[SessionManager]:
+        return self._sessions.get(session_id)
+
+    def list(self) -> List[SessionManager]:
+        return list(self._sessions.values())
+
+    def __len__(self):
+        return len(self._sessions)
+
+    async def shutdown_all(self):
+        for session_id in list(self._sessions):
+            await self.destroy(session_id)